@@ -32,6 +32,39 @@ class Settings(BaseSettings):
     TWILIO_AUTH_TOKEN: str = ""
     TWILIO_FROM_NUMBER: str = ""  # e.g. +1XXXXXXXXXX
 
+    # ML inference engine: "auto", "sklearn" (predict_proba on the pickle),
+    # "flat" (array-compiled forest) or "mmap" (memory-mapped array export)
+    ML_ENGINE: str = "auto"
+    # "compact" (distilled, default) or "full" (100-tree high-accuracy forest)
+    ML_MODEL_VARIANT: str = "compact"
+    # Re-hash the exported model arrays against their manifest on load
+    ML_VERIFY_CHECKSUM: bool = False
+
+    # Model registry: seconds between registry.json polls (0 disables hot reload)
+    MODEL_REGISTRY_POLL_SECONDS: int = 10
+    # Shared secret for /admin routes (X-Admin-Key header); empty disables them
+    ADMIN_API_KEY: str = ""
+
+    # Micro-batching inference scheduler
+    INFERENCE_MAX_BATCH_SIZE: int = 64
+    INFERENCE_MAX_WAIT_US: int = 2000
+    INFERENCE_WORKERS: int = 1
+
+    # Write-behind buffer for prediction records
+    PREDICTION_WRITE_BATCH_SIZE: int = 100
+    PREDICTION_WRITE_FLUSH_MS: int = 200
+    PREDICTION_WRITE_MAX_PENDING: int = 5000
+    # How long a request waits for room in a full buffer before failing with 503
+    PREDICTION_WRITE_MAX_WAIT_MS: int = 2000
+
+    # Mongo cache for GPT risk recommendations (keyed by prompt inputs)
+    RECOMMENDATION_CACHE_ENABLED: bool = True
+    RECOMMENDATION_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+
+    # Per-user response cache for read-heavy routes (in-process LRU)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000
+
     # App
     APP_ENV: str = "development"
     CORS_ORIGINS: str = "http://localhost:3000"
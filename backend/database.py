@@ -24,7 +24,11 @@ async def connect_db():
     await db.users.create_index("clerk_id", unique=True)
     await db.predictions.create_index("user_id")
     await db.predictions.create_index("created_at")
+    # Keyset pagination of a user's history on (created_at, _id)
+    await db.predictions.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.risk_daily.create_index([("user_id", 1), ("day", -1)], unique=True)
     await db.medications.create_index("user_id")
+    await db.medications.create_index("last_taken_day")
     await db.posts.create_index("created_at")
     await db.posts.create_index("user_id")
     await db.workout_plans.create_index("user_id")
@@ -3,6 +3,7 @@ CardioSphere Backend — FastAPI application entry point.
 Registers all routes, middleware, and lifecycle events.
 """
 
+import asyncio
 import logging
 
 from fastapi import FastAPI
@@ -12,6 +13,12 @@ from contextlib import asynccontextmanager
 from config import get_settings
 from database import connect_db, close_db
 from services.ml_service import load_model
+from services.inference_scheduler import inference_scheduler
+from services.prediction_writer import prediction_writer
+from services.model_registry import watch_registry
+from services import recommendation_worker
+from services.recommendation_cache import ensure_indexes as ensure_recommendation_cache_indexes
+from services.dose_events import ensure_collections as ensure_dose_event_collections
 
 # Configure logging so prescription_service logs appear in uvicorn output
 logging.basicConfig(
@@ -28,7 +35,10 @@ from routes.medication import router as medication_router
 from routes.dashboard import router as dashboard_router
 from routes.community import router as community_router
 from routes.hospitals import router as hospitals_router
-from services.scheduler_service import scheduler, reschedule_all_on_startup
+from routes.admin import router as admin_router
+from services.scheduler_service import (
+    scheduler, reschedule_all_on_startup, schedule_streak_reset, schedule_missed_doses,
+)
 
 settings = get_settings()
 
@@ -38,14 +48,28 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown logic."""
     # Startup
     await connect_db()
+    await ensure_recommendation_cache_indexes()
+    await ensure_dose_event_collections()
     load_model()
+    registry_watcher = None
+    if settings.MODEL_REGISTRY_POLL_SECONDS > 0:
+        registry_watcher = asyncio.create_task(watch_registry(settings.MODEL_REGISTRY_POLL_SECONDS))
+    await inference_scheduler.start()
+    await prediction_writer.start()
     scheduler.start()
     from database import get_db
     await reschedule_all_on_startup(get_db())
+    schedule_streak_reset(get_db())
+    schedule_missed_doses()
     print("🚀 CardioSphere API is ready")
     yield
     # Shutdown
     scheduler.shutdown(wait=False)
+    if registry_watcher:
+        registry_watcher.cancel()
+    await inference_scheduler.stop()
+    await recommendation_worker.drain()
+    await prediction_writer.stop()
     await close_db()
 
 
@@ -63,6 +87,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Register all routers under /api/v1
@@ -74,6 +99,7 @@ app.include_router(medication_router, prefix=PREFIX)
 app.include_router(dashboard_router, prefix=PREFIX)
 app.include_router(community_router, prefix=PREFIX)
 app.include_router(hospitals_router, prefix=PREFIX)
+app.include_router(admin_router, prefix=PREFIX)
 
 
 @app.get("/")
@@ -0,0 +1,66 @@
+"""
+Check the FlatForest engine against sklearn and compare their latency.
+Uses the same BRFSS test split as train_model.py (test_size=0.2, random_state=42).
+Run from backend/:  python ml/benchmark_engine.py
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import joblib
+from sklearn.model_selection import train_test_split
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dataset import load_dataset  # noqa: E402
+from services.forest_engine import FlatForest  # noqa: E402
+from services.ml_service import MODEL_PATH  # noqa: E402
+
+
+def _time_per_call(fn, X, repeats: int) -> float:
+    """Median wall time of fn(X) in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def benchmark():
+    print("📊 Loading data and model...")
+    X, y, _ = load_dataset()
+    _, X_test, _, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_test = X_test.astype(np.float64)
+
+    model = joblib.load(MODEL_PATH)
+    # Single-threaded sklearn accumulates trees in a fixed order, like FlatForest
+    model.set_params(n_jobs=1)
+
+    start = time.perf_counter()
+    flat = FlatForest.from_sklearn(model)
+    print(f"⚙️  Compiled {flat.n_estimators} trees ({len(flat.feature)} nodes, "
+          f"depth {flat.max_depth}) in {time.perf_counter() - start:.2f}s")
+
+    # Equivalence on the full held-out split
+    expected = model.predict_proba(X_test)
+    actual = flat.predict_proba(X_test)
+    max_diff = float(np.abs(expected - actual).max())
+    identical = np.array_equal(expected, actual)
+    print(f"✅ Equivalence on {len(X_test)} rows: identical={identical}, max |diff|={max_diff:.3e}")
+    if not identical:
+        sys.exit("❌ FlatForest output differs from sklearn")
+
+    # Latency comparison
+    model.set_params(n_jobs=-1)
+    for label, batch in (("1 row", X_test[:1]), ("1k rows", X_test[:1000])):
+        repeats = 200 if len(batch) == 1 else 20
+        sk_ms = _time_per_call(model.predict_proba, batch, repeats)
+        flat_ms = _time_per_call(flat.predict_proba, batch, repeats)
+        print(f"⏱️  {label:>7}: sklearn {sk_ms:8.3f} ms | flat {flat_ms:8.3f} ms | "
+              f"speedup {sk_ms / flat_ms:5.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
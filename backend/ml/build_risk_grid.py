@@ -0,0 +1,111 @@
+"""
+Precompute the heart disease probability for every point of the discrete
+feature space and save it as a float16 .npy grid for ml_service to mmap.
+14 of the 15 features are categorical (~400k combinations); BMI is binned
+at the model's own split thresholds, so each bin has exactly one answer.
+The grid is built from the model ml_service would serve and saved next to
+it (ml/ for the .pkl, inside the export or registry version directory for
+array exports); its manifest records that model's checksum and version,
+and ml_service ignores a grid whose model doesn't match exactly.
+Run from backend/ after training or exporting:
+  python ml/build_risk_grid.py [--variant compact|full] [--engine ...]
+  python ml/build_risk_grid.py --version <registry version>
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.ml_service import (  # noqa: E402
+    GRID_LEVELS, GRID_BMI_RANGE, BMI_INDEX,
+    build_state, grid_bmi_edges, grid_paths, model_checksum,
+)
+from services.model_registry import read_registry, version_dir  # noqa: E402
+
+
+def _bmi_representatives(edges: np.ndarray) -> np.ndarray:
+    """One BMI value inside each bin delimited by edges."""
+    low, high = GRID_BMI_RANGE
+    bounds = np.concatenate([[low], edges, [high]])
+    reps = (bounds[:-1] + bounds[1:]) / 2
+    reps[0], reps[-1] = low, high
+
+    # Every representative must land in its own bin under sklearn's float32 cast
+    bins = np.searchsorted(edges, reps.astype(np.float32), side="left")
+    assert np.array_equal(bins, np.arange(len(reps))), "BMI representatives fall outside their bins"
+    return reps
+
+
+def build(variant: str | None = None, engine: str | None = None, artifact_dir: str | None = None):
+    state = build_state(engine, artifact_dir=artifact_dir, variant=variant, load_grid=False)
+    if state is None:
+        sys.exit("❌ No model to build the grid from")
+    grid_path, manifest_path = grid_paths(state)
+    print(f"📦 Building the grid for model {state.version} ({state.source})...")
+    model = state.predictor
+    edges = grid_bmi_edges(state.bmi_thresholds)
+    bmi_reps = _bmi_representatives(edges)
+
+    categorical = [levels for levels in GRID_LEVELS if levels is not None]
+    cat_shape = tuple(len(levels) for levels in categorical)
+    grid_shape = list(cat_shape)
+    grid_shape.insert(BMI_INDEX, len(bmi_reps))
+
+    # Every categorical combination, as actual feature values (row-major order)
+    combos = np.indices(cat_shape).reshape(len(cat_shape), -1).T
+    cat_values = np.column_stack([
+        np.asarray(levels, dtype=np.float64)[combos[:, i]] for i, levels in enumerate(categorical)
+    ])
+    n_combos = len(cat_values)
+    print(f"🧮 {n_combos:,} categorical combinations × {len(bmi_reps)} BMI bins "
+          f"= {n_combos * len(bmi_reps):,} cells")
+
+    tmp_path = grid_path + ".tmp"
+    grid = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=tuple(grid_shape))
+    features = np.insert(cat_values, BMI_INDEX, 0.0, axis=1)
+
+    start = time.perf_counter()
+    for b, bmi in enumerate(bmi_reps):
+        features[:, BMI_INDEX] = bmi
+        proba = model.predict_proba(features)[:, 1].astype(np.float16)
+        # Move the BMI axis to the front so bin b is one contiguous slab to fill
+        np.moveaxis(grid, BMI_INDEX, 0)[b] = proba.reshape(cat_shape)
+        print(f"   BMI bin {b + 1}/{len(bmi_reps)} (≈{bmi:.1f}) done", end="\r")
+    grid.flush()
+    del grid
+    os.replace(tmp_path, grid_path)
+    print(f"\n✅ Grid built in {time.perf_counter() - start:.1f}s")
+
+    manifest = {
+        "shape": grid_shape,
+        "dtype": "float16",
+        "bmi_range": list(GRID_BMI_RANGE),
+        "bmi_edges": edges.tolist(),
+        "model_version": state.version,
+        "model_checksum": model_checksum(state),
+        "model_path": os.path.abspath(state.source),
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    size_mb = os.path.getsize(grid_path) / 1024 / 1024
+    print(f"💾 Grid saved to {grid_path} ({size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the risk grid")
+    parser.add_argument("--variant", choices=["compact", "full"], default=None,
+                        help="model variant to grid (default: ML_MODEL_VARIANT)")
+    parser.add_argument("--engine", choices=["auto", "sklearn", "flat", "mmap"], default=None,
+                        help="engine the served model is loaded with (default: ML_ENGINE)")
+    parser.add_argument("--version", default=None, help="build the grid of a registered model version")
+    args = parser.parse_args()
+    if args.version and args.version not in read_registry()["versions"]:
+        sys.exit(f"❌ Unknown model version '{args.version}'")
+    build(args.variant, args.engine, version_dir(args.version) if args.version else None)
@@ -0,0 +1,99 @@
+"""
+Columnar cache for the BRFSS training data in model/data.csv.
+The CSV is parsed once, each column is narrowed to the smallest dtype that
+holds it (uint8 for flags and categories, float32 otherwise) and written as
+a separate .npy file under a directory keyed by the CSV's content hash.
+Later runs memory-map those columns instead of re-parsing the CSV.
+Depends only on numpy/pandas so model/train.py can import it too.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "model", "data.csv")
+CACHE_ROOT = os.path.join(os.path.dirname(DATA_PATH), "data_cache")
+
+TARGET = "HeartDiseaseorAttack"
+# Columns present in the CSV but not used by the model
+DROP_COLS = ["Education", "Income", "NoDocbcCost", "AnyHealthcare", "MentHlth", "PhysHlth"]
+
+
+def _content_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _narrow(series: pd.Series) -> np.ndarray:
+    """Smallest lossless dtype: uint8 for small non-negative integers, else float32."""
+    values = series.to_numpy()
+    if np.all(np.mod(values, 1) == 0) and values.min() >= 0 and values.max() <= 255:
+        return values.astype(np.uint8)
+    narrowed = values.astype(np.float32)
+    if not np.array_equal(narrowed.astype(values.dtype), values):
+        return values.astype(np.float64)
+    return narrowed
+
+
+def build_cache(csv_path: str = DATA_PATH) -> str:
+    """Convert the CSV into typed .npy columns (no-op if already cached). Returns the cache dir."""
+    digest = _content_hash(csv_path)
+    cache_dir = os.path.join(CACHE_ROOT, digest[:16])
+    if os.path.exists(os.path.join(cache_dir, "manifest.json")):
+        return cache_dir
+
+    print(f"🗜️  Building columnar cache for {csv_path}...")
+    data = pd.read_csv(csv_path, skipinitialspace=True)
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    dtypes = {}
+    for column in data.columns:
+        values = _narrow(data[column])
+        np.save(os.path.join(tmp_dir, f"{column}.npy"), values, allow_pickle=False)
+        dtypes[column] = str(values.dtype)
+
+    manifest = {"csv_sha256": digest, "rows": len(data), "columns": list(data.columns), "dtypes": dtypes}
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_dir, cache_dir)
+
+    csv_mb = data.memory_usage(deep=True).sum() / 1024 / 1024
+    cached_mb = sum(np.dtype(d).itemsize for d in dtypes.values()) * len(data) / 1024 / 1024
+    print(f"✅ Cached {len(data):,} rows: {csv_mb:.1f} MB as parsed → {cached_mb:.1f} MB typed")
+    return cache_dir
+
+
+def load_columns(csv_path: str = DATA_PATH, mmap: bool = True) -> dict[str, np.ndarray]:
+    """All columns of the dataset as (memory-mapped) typed arrays, in CSV order."""
+    cache_dir = build_cache(csv_path)
+    with open(os.path.join(cache_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    return {
+        column: np.load(os.path.join(cache_dir, f"{column}.npy"), mmap_mode="r" if mmap else None)
+        for column in manifest["columns"]
+    }
+
+
+def load_dataset(csv_path: str = DATA_PATH, mmap: bool = True) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """
+    Model features and target: X in the narrowest dtype that holds every
+    feature column (uint8 for the BRFSS data, since BMI is whole numbers),
+    y as uint8, plus the feature names in order. X is not widened to
+    float32 here: sklearn converts the training split itself, so an up-front
+    float32 copy would only add a second full-size matrix.
+    """
+    columns = load_columns(csv_path, mmap=mmap)
+    feature_names = [c for c in columns if c != TARGET and c not in DROP_COLS]
+    dtype = np.result_type(*(columns[name].dtype for name in feature_names))
+    X = np.empty((len(columns[TARGET]), len(feature_names)), dtype=dtype)
+    for i, name in enumerate(feature_names):
+        X[:, i] = columns[name]
+    return X, np.asarray(columns[TARGET]), feature_names
@@ -0,0 +1,86 @@
+"""
+Export the trained RandomForest as uncompressed NumPy arrays plus a JSON
+manifest (feature order, risk thresholds, model version, checksum).
+ml_service memory-maps this directory at startup instead of unpickling
+the .pkl, so cold start is near-instant and pages are shared by workers.
+Run from backend/ after training:
+  python ml/export_model.py [version] [--variant compact|full]  # model/heart_disease_model[_compact]/
+  python ml/export_model.py [version] --register [--activate]  # model/registry/<version>/
+Add --grid to also build the exported model's risk grid into its directory
+(a version without one is served from the forest, never another model's grid).
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+import joblib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.forest_engine import FlatForest  # noqa: E402
+from services.model_registry import read_registry, register_version, version_dir  # noqa: E402
+from services.ml_service import (  # noqa: E402
+    FEATURE_NAMES, LOW_RISK_THRESHOLD, PREDICTION_THRESHOLD, resolve_variant, variant_paths,
+)
+
+
+def export(
+    model_version: str | None = None,
+    register: bool = False,
+    activate: bool = False,
+    variant: str | None = None,
+    grid: bool = False,
+):
+    variant = resolve_variant(variant)
+    model_path, artifact_dir = variant_paths(variant)
+    print(f"📦 Loading {variant} model from {model_path}...")
+    model = joblib.load(model_path)
+    if list(getattr(model, "feature_names_in_", FEATURE_NAMES)) != FEATURE_NAMES:
+        sys.exit(f"❌ Model feature order {list(model.feature_names_in_)} does not match {FEATURE_NAMES}")
+
+    directory = artifact_dir
+    if register:
+        model_version = model_version or datetime.utcnow().strftime("v%Y%m%d-%H%M%S")
+        if model_version in read_registry()["versions"]:
+            sys.exit(f"❌ Version {model_version} is already registered")
+        directory = version_dir(model_version)
+
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(model)
+    manifest = forest.save(
+        directory,
+        feature_names=FEATURE_NAMES,
+        model_version=model_version,
+        metadata={
+            "risk_thresholds": {"low": LOW_RISK_THRESHOLD, "high": PREDICTION_THRESHOLD},
+            "source": os.path.basename(model_path),
+            "variant": variant,
+        },
+    )
+    print(f"✅ Exported {manifest['n_estimators']} trees / {manifest['n_nodes']:,} nodes "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"💾 Version {manifest['model_version']} saved to {directory}")
+
+    if grid:
+        # Built before registering so workers never load the version without its grid
+        from build_risk_grid import build as build_grid
+        build_grid(artifact_dir=directory)
+
+    if register:
+        register_version(model_version, manifest, activate=activate)
+        state = "registered and activated" if activate else "registered"
+        print(f"📚 Version {model_version} {state} — running workers pick it up on their next registry poll")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the model as mmap-able arrays")
+    parser.add_argument("version", nargs="?", default=None, help="model version label")
+    parser.add_argument("--register", action="store_true", help="export into the model registry")
+    parser.add_argument("--activate", action="store_true", help="make the registered version active")
+    parser.add_argument("--variant", choices=["compact", "full"], default=None,
+                        help="model variant to export (default: ML_MODEL_VARIANT)")
+    parser.add_argument("--grid", action="store_true", help="also build the exported model's risk grid")
+    args = parser.parse_args()
+    export(args.version, register=args.register, activate=args.activate, variant=args.variant, grid=args.grid)
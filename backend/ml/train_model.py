@@ -1,32 +1,79 @@
 """
 Train the heart disease RandomForest model and save it as a .pkl file.
-Uses the BRFSS dataset from model/data.csv.
+Uses the BRFSS dataset from model/data.csv (via the columnar cache in ml/dataset.py).
 Run this script once to generate ml/heart_disease_model.pkl.
+
+  python ml/train_model.py                   # train the fixed production config
+  python ml/train_model.py --search          # hyperparameter search + frontier report
+  python ml/train_model.py --search --budget-ms 5 --workers 4
+  python ml/train_model.py --distill         # full model + guarded compact student
+
+--distill publishes the student and the teacher it was checked against
+where ml_service serves them from (model/heart_disease_model_compact.pkl
+and model/heart_disease_model.pkl), and publishes neither if the student
+fails the guard; follow with python ml/export_model.py --variant compact
+(and --variant full) for the mmap exports.
 """
 
 import os
 import sys
-import pandas as pd
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+import argparse
+import itertools
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import roc_auc_score, accuracy_score, log_loss
 import joblib
 
-# Path to data (relative to project root)
-DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "model", "data.csv")
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+from dataset import load_dataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.ml_service import COMPACT_MODEL_PATH, MODEL_PATH, classify_risk  # noqa: E402
+
 OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "heart_disease_model.pkl")
+# --distill publishes straight to the paths ml_service loads each variant from,
+# so the served full model is the one the compact model was validated against
+FULL_OUTPUT_PATH = MODEL_PATH
+COMPACT_OUTPUT_PATH = COMPACT_MODEL_PATH
+SEARCH_REPORT_PATH = os.path.join(os.path.dirname(__file__), "search_report.json")
+
+# Compact student for --distill: few, shallow trees
+COMPACT_PARAMS = {"n_estimators": 25, "max_depth": 10, "min_samples_leaf": 50}
+# Largest regressions vs the full model that --distill will still publish
+MAX_AUC_DROP = 0.005
+MAX_LOGLOSS_INCREASE = 0.01
+# classify_risk's thresholds were tuned on the full model; distillation shifts
+# probabilities, so the student must give the same Low/Medium/High on most rows
+MIN_CATEGORY_AGREEMENT = 0.95
+
+# Candidate grid for --search
+SEARCH_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 12, 20],
+    "min_samples_leaf": [1, 5, 20],
+    "class_weight": [None, "balanced"],
+}
 
 
 def train():
     print("📊 Loading data...")
-    data = pd.read_csv(DATA_PATH)
-
-    # Drop columns not used by the model
-    drop_cols = ["Education", "Income", "NoDocbcCost", "AnyHealthcare", "MentHlth", "PhysHlth"]
-    X = data.drop(columns=["HeartDiseaseorAttack"] + drop_cols)
-    y = data["HeartDiseaseorAttack"]
+    # Typed, memory-mapped columns; unused columns are dropped by load_dataset
+    X, y, feature_names = load_dataset()
 
-    print(f"Features ({len(X.columns)}): {list(X.columns)}")
+    print(f"Features ({len(feature_names)}): {feature_names}")
     print(f"Dataset size: {len(X)} samples")
 
     X_train, X_test, y_train, y_test = train_test_split(
@@ -52,5 +99,251 @@ def train():
     print(f"💾 Model saved to {OUTPUT_PATH}")
 
 
+# ---------- Distillation ----------
+
+def _evaluate_model(model, X_test, y_test) -> dict:
+    proba = model.predict_proba(X_test)[:, 1]
+    return {
+        "roc_auc": float(roc_auc_score(y_test, proba)),
+        "log_loss": float(log_loss(y_test, proba)),
+        "size_mb": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024 / 1024,
+        "proba": proba,
+    }
+
+
+def _category_agreement(teacher_proba: np.ndarray, student_proba: np.ndarray) -> float:
+    """Share of rows that classify_risk puts in the same category for both models."""
+    same = [classify_risk(t) == classify_risk(s) for t, s in zip(teacher_proba, student_proba)]
+    return float(np.mean(same))
+
+
+def distill(
+    max_auc_drop: float = MAX_AUC_DROP,
+    max_logloss_increase: float = MAX_LOGLOSS_INCREASE,
+    min_category_agreement: float = MIN_CATEGORY_AGREEMENT,
+):
+    """
+    Train the full forest, then a compact student on its out-of-bag soft
+    labels. Each training row is given twice — as class 1 weighted by the
+    teacher's probability and as class 0 weighted by its complement — so
+    the student's leaves learn the teacher's probabilities, not just labels.
+    Student and teacher are published together, and only if the student
+    stays within the AUC / log-loss tolerance and agrees with the teacher's
+    risk categories on the test split.
+    """
+    print("📊 Loading data...")
+    X, y, _ = load_dataset()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    print("🏋️ Training full RandomForest (teacher)...")
+    # oob_score only adds out-of-bag estimates; the fitted trees are the same as train()'s
+    teacher = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1, oob_score=True)
+    teacher.fit(X_train, y_train)
+    soft = np.nan_to_num(teacher.oob_decision_function_[:, 1], nan=float(np.mean(y_train)))
+
+    print(f"🧪 Distilling into {COMPACT_PARAMS}...")
+    X_soft = np.concatenate([X_train, X_train])
+    y_soft = np.concatenate([np.ones(len(X_train)), np.zeros(len(X_train))])
+    weights = np.concatenate([soft, 1.0 - soft])
+    student = RandomForestClassifier(random_state=42, n_jobs=-1, **COMPACT_PARAMS)
+    student.fit(X_soft, y_soft, sample_weight=weights)
+
+    full = _evaluate_model(teacher, X_test, y_test)
+    compact = _evaluate_model(student, X_test, y_test)
+    auc_drop = full["roc_auc"] - compact["roc_auc"]
+    ll_increase = compact["log_loss"] - full["log_loss"]
+    agreement = _category_agreement(full["proba"], compact["proba"])
+    print(f"{'':>8} {'ROC AUC':>8} {'LogLoss':>8} {'MB':>8}")
+    for label, m in (("full", full), ("compact", compact)):
+        print(f"{label:>8} {m['roc_auc']:>8.4f} {m['log_loss']:>8.4f} {m['size_mb']:>8.1f}")
+    print(f"Risk category agreement: {agreement:.2%} "
+          f"(mean probability {full['proba'].mean():.4f} → {compact['proba'].mean():.4f})")
+
+    if auc_drop > max_auc_drop or ll_increase > max_logloss_increase:
+        sys.exit(f"❌ Compact model NOT published: AUC drop {auc_drop:.4f} (max {max_auc_drop}), "
+                 f"log-loss increase {ll_increase:.4f} (max {max_logloss_increase})")
+    if agreement < min_category_agreement:
+        sys.exit(f"❌ Compact model NOT published: risk category agreement {agreement:.2%} "
+                 f"(min {min_category_agreement:.0%}) — its calibration doesn't fit classify_risk's thresholds")
+    joblib.dump(teacher, FULL_OUTPUT_PATH)
+    print(f"💾 Full model saved to {FULL_OUTPUT_PATH}")
+    joblib.dump(student, COMPACT_OUTPUT_PATH)
+    print(f"💾 Compact model saved to {COMPACT_OUTPUT_PATH} "
+          f"(AUC {-auc_drop:+.4f}, log loss {ll_increase:+.4f} vs full)")
+
+
+# ---------- Hyperparameter search ----------
+
+# Training/test arrays attached from shared memory in each worker process
+_shared: dict = {}
+
+
+def _share(array: np.ndarray) -> tuple[shared_memory.SharedMemory, dict]:
+    """Copy an array into a new shared memory block; returns the block and its spec."""
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, {"name": block.name, "shape": array.shape, "dtype": str(array.dtype)}
+
+
+def _attach(specs: dict, model_dir: str):
+    """Pool initializer — map the parent's arrays without copying them."""
+    _shared["model_dir"] = model_dir
+    for key, spec in specs.items():
+        block = shared_memory.SharedMemory(name=spec["name"])
+        _shared[key] = (block, np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=block.buf))
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes on Linux
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _evaluate(params: dict) -> dict:
+    """
+    Fit one candidate and measure quality, size and memory. The fitted model
+    is saved to the shared model directory; latency is measured afterwards
+    by _measure_latency in the parent, once no other candidate is training.
+    """
+    X_train, y_train = _shared["X_train"][1], _shared["y_train"][1]
+    X_test, y_test = _shared["X_test"][1], _shared["y_test"][1]
+
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    proba = model.predict_proba(X_test)[:, 1]
+    key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    model_path = os.path.join(_shared["model_dir"], f"{key}.joblib")
+    joblib.dump(model, model_path)
+
+    return {
+        "params": params,
+        "roc_auc": round(float(roc_auc_score(y_test, proba)), 5),
+        "log_loss": round(float(log_loss(y_test, proba)), 5),
+        "size_mb": round(len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024 / 1024, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "fit_s": round(fit_s, 1),
+        "model_path": model_path,
+    }
+
+
+def _measure_latency(model, X_test: np.ndarray) -> dict:
+    """Single-row p50/p99 and 1k-row batch latency, run with nothing else training."""
+    single = []
+    for i in range(200):
+        row = X_test[i:i + 1]
+        t0 = time.perf_counter()
+        model.predict_proba(row)
+        single.append((time.perf_counter() - t0) * 1000)
+    batch = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        model.predict_proba(X_test[:1000])
+        batch.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "latency_1_p50_ms": round(float(np.percentile(single, 50)), 3),
+        "latency_1_p99_ms": round(float(np.percentile(single, 99)), 3),
+        "latency_1k_ms": round(float(np.median(batch)), 3),
+    }
+
+
+def _pareto_frontier(results: list[dict]) -> list[dict]:
+    """Candidates not beaten on both ROC AUC and p99 single-row latency."""
+    frontier = []
+    for r in sorted(results, key=lambda r: (r["latency_1_p99_ms"], -r["roc_auc"])):
+        if not frontier or r["roc_auc"] > frontier[-1]["roc_auc"]:
+            frontier.append(r)
+    return frontier
+
+
+def search(workers: int | None = None, budget_ms: float | None = None):
+    """Train every SEARCH_GRID candidate in a process pool and report the accuracy-vs-latency frontier."""
+    print("📊 Loading data...")
+    X, y, _ = load_dataset()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    keys = list(SEARCH_GRID)
+    candidates = [dict(zip(keys, values)) for values in itertools.product(*SEARCH_GRID.values())]
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    print(f"🔎 Searching {len(candidates)} candidates on {workers} worker(s)...")
+
+    blocks, specs = [], {}
+    for key, array in (("X_train", X_train), ("y_train", y_train), ("X_test", X_test), ("y_test", y_test)):
+        block, specs[key] = _share(np.ascontiguousarray(array))
+        blocks.append(block)
+
+    results = []
+    model_dir = tempfile.mkdtemp(prefix="rf_search_")
+    try:
+        # One task per child so peak RSS is measured per candidate
+        with mp.Pool(workers, initializer=_attach, initargs=(specs, model_dir), maxtasksperchild=1) as pool:
+            for i, result in enumerate(pool.imap_unordered(_evaluate, candidates), 1):
+                results.append(result)
+                print(f"   [{i}/{len(candidates)}] {result['params']} → AUC {result['roc_auc']:.4f}")
+
+        # Latency is timed serially after the pool is gone, so training candidates can't skew it
+        print("⏱️  Measuring latency...")
+        for result in results:
+            model_path = result.pop("model_path")
+            result.update(_measure_latency(joblib.load(model_path), X_test))
+            os.remove(model_path)
+            print(f"   {result['params']} → p99 {result['latency_1_p99_ms']:.2f} ms")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+        for name in os.listdir(model_dir):
+            os.remove(os.path.join(model_dir, name))
+        os.rmdir(model_dir)
+
+    frontier = _pareto_frontier(results)
+    print("\n🏁 Accuracy-vs-latency frontier:")
+    print(f"{'ROC AUC':>8} {'LogLoss':>8} {'p50 ms':>8} {'p99 ms':>8} {'1k ms':>8} {'MB':>7} {'RSS MB':>7}  params")
+    for r in frontier:
+        print(f"{r['roc_auc']:>8.4f} {r['log_loss']:>8.4f} {r['latency_1_p50_ms']:>8.2f} "
+              f"{r['latency_1_p99_ms']:>8.2f} {r['latency_1k_ms']:>8.1f} {r['size_mb']:>7.1f} "
+              f"{r['peak_rss_mb']:>7.0f}  {r['params']}")
+
+    recommended = None
+    if budget_ms is not None:
+        within = [r for r in results if r["latency_1_p99_ms"] <= budget_ms]
+        if within:
+            recommended = max(within, key=lambda r: (r["roc_auc"], -r["log_loss"]))
+            print(f"\n✅ Best within p99 ≤ {budget_ms} ms: {recommended['params']} (AUC {recommended['roc_auc']:.4f})")
+        else:
+            print(f"\n⚠️  No candidate meets p99 ≤ {budget_ms} ms")
+
+    report = {
+        "grid": SEARCH_GRID,
+        "budget_ms": budget_ms,
+        "recommended": recommended,
+        "frontier": frontier,
+        "results": sorted(results, key=lambda r: -r["roc_auc"]),
+    }
+    with open(SEARCH_REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report saved to {SEARCH_REPORT_PATH}")
+
+
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the heart disease model")
+    parser.add_argument("--search", action="store_true", help="run the hyperparameter search instead of training")
+    parser.add_argument("--workers", type=int, default=None, help="search worker processes")
+    parser.add_argument("--budget-ms", type=float, default=None, help="p99 single-row latency budget")
+    parser.add_argument("--distill", action="store_true", help="also build the guarded compact model")
+    parser.add_argument("--max-auc-drop", type=float, default=MAX_AUC_DROP)
+    parser.add_argument("--max-logloss-increase", type=float, default=MAX_LOGLOSS_INCREASE)
+    parser.add_argument("--min-category-agreement", type=float, default=MIN_CATEGORY_AGREEMENT)
+    args = parser.parse_args()
+
+    if args.search:
+        search(workers=args.workers, budget_ms=args.budget_ms)
+    elif args.distill:
+        distill(args.max_auc_drop, args.max_logloss_increase, args.min_category_agreement)
+    else:
+        train()
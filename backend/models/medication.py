@@ -54,8 +54,8 @@ class MedicationResponse(BaseModel):
     adherence_status: bool = False
     last_taken: Optional[datetime] = None
     sms_reminders_enabled: bool = False
-    taken_dates: List[str] = []
     streak: int = 0
+    adherence_rate: float = 0.0  # % of the last 30 days taken
     created_at: datetime
 
 
@@ -76,7 +76,9 @@ class MedicationRecord(BaseModel):
     last_taken: Optional[datetime] = None
     sms_reminders_enabled: bool = False
     reminder_job_ids: List[str] = []
-    taken_dates: List[str] = []  # list of "YYYY-MM-DD" when taken
-    streak: int = 0
+    adherence_origin: str = ""  # "YYYY-MM-DD" of bit 0 in adherence_bits
+    adherence_bits: bytes = b""  # bit i set = taken on adherence_origin + i days
+    last_taken_day: Optional[str] = None  # "YYYY-MM-DD", maintained by /take
+    streak: int = 0  # consecutive days ending at last_taken_day
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
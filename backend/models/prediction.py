@@ -30,6 +30,14 @@ class PredictionInput(BaseModel):
     age: float = Field(..., ge=1, le=13, description="Age category 1-13 (18-24 to 80+)")
 
 
+class RiskDriver(BaseModel):
+    """One feature's contribution to this prediction, from the model itself."""
+    feature: str = Field(..., description="PredictionInput field name")
+    label: str
+    value: float = Field(..., description="The patient's input value")
+    contribution: float = Field(..., description="Effect on risk in percentage points (+ raises, - lowers)")
+
+
 class RiskFactor(BaseModel):
     factor: str
     explanation: str
@@ -48,12 +56,30 @@ class Recommendations(BaseModel):
 
 class PredictionOutput(BaseModel):
     """Result returned by the prediction endpoint."""
+    id: Optional[str] = Field(None, description="MongoDB ID of the stored prediction")
     probability: float = Field(..., description="Heart disease probability 0-1")
     risk_percentage: float = Field(..., description="Risk as percentage 0-100")
     risk_category: str = Field(..., description="Low / Medium / High")
     confidence_score: float = Field(..., description="Model confidence 0-1")
     input_summary: dict = Field(..., description="Echo of input parameters")
     recommendations: Optional[Recommendations] = Field(None, description="Personalized AI recommendations")
+    recommendations_status: Optional[str] = Field(None, description="pending / ready / failed")
+    model_version: Optional[str] = Field(None, description="Model version that produced this prediction")
+    risk_drivers: Optional[list[RiskDriver]] = Field(None, description="Top model-derived risk drivers")
+
+
+class BatchPredictionInput(BaseModel):
+    """A screening cohort scored in one request."""
+    rows: list[PredictionInput] = Field(..., min_length=1, max_length=5000, description="Patients to score")
+    include_recommendations: bool = Field(False, description="Also generate AI recommendations per row (slow)")
+    include_risk_drivers: bool = Field(False, description="Also return per-row feature attributions")
+
+
+class BatchPredictionOutput(BaseModel):
+    """Result returned by the batch prediction endpoint, in input order."""
+    count: int
+    prediction_ids: list[str] = Field(default=[], description="MongoDB IDs of the stored records")
+    results: list[PredictionOutput]
 
 
 class PredictionRecord(BaseModel):
@@ -65,4 +91,6 @@ class PredictionRecord(BaseModel):
     risk_category: str
     confidence_score: float
     recommendations: Optional[dict] = None
+    recommendations_status: Optional[str] = None  # pending | ready | failed
+    model_version: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
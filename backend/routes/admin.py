@@ -0,0 +1,99 @@
+"""
+Admin routes — model registry status, zero-downtime model reload,
+recommendation/response cache and prediction write-buffer stats, and
+rebuilding the materialized user_stats documents.
+Protected by the ADMIN_API_KEY shared secret (X-Admin-Key header).
+"""
+
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from config import get_settings
+from services.ml_service import get_state, prediction_cache_info
+from services.model_registry import read_registry, reload_model
+from services.inference_scheduler import inference_scheduler
+from services.recommendation_cache import cache_info
+from services import response_cache
+from services.prediction_writer import prediction_writer
+from services.user_stats import rebuild_user_stats, rebuild_all_user_stats
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+async def require_admin(x_admin_key: Optional[str] = Header(default=None)):
+    """Reject the request unless it carries the configured admin key."""
+    expected = get_settings().ADMIN_API_KEY
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if x_admin_key is None or not secrets.compare_digest(x_admin_key.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None
+
+
+class RebuildStatsRequest(BaseModel):
+    user_id: Optional[str] = None
+
+
+@router.get("/model", dependencies=[Depends(require_admin)])
+async def get_model_status():
+    """GET /admin/model — active model, registry contents and inference stats."""
+    state = get_state()
+    return {
+        "active_version": state.version if state else None,
+        "engine": state.engine if state else None,
+        "source": state.source if state else None,
+        "registry": read_registry(),
+        "prediction_cache": prediction_cache_info(),
+        "inference": inference_scheduler.stats(),
+    }
+
+
+@router.post("/model/reload", dependencies=[Depends(require_admin)])
+async def reload_model_version(data: ReloadRequest):
+    """
+    POST /admin/model/reload
+    Loads the given registry version (default: registry's active one) in the
+    background, warms it up and swaps it in. Other workers follow via registry polling.
+    """
+    try:
+        version = await reload_model(data.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {str(e)}")
+    return {"message": "Model reloaded", "active_version": version}
+
+
+@router.get("/recommendation-cache", dependencies=[Depends(require_admin)])
+async def get_recommendation_cache_status():
+    """GET /admin/recommendation-cache — hit rate and size of the GPT recommendation cache."""
+    return await cache_info()
+
+
+@router.get("/response-cache", dependencies=[Depends(require_admin)])
+async def get_response_cache_status():
+    """GET /admin/response-cache — hits, misses and 304s of the per-user response cache."""
+    return response_cache.cache_info()
+
+
+@router.get("/write-buffer", dependencies=[Depends(require_admin)])
+async def get_write_buffer_status():
+    """GET /admin/write-buffer — flush metrics of the prediction write-behind buffer."""
+    return prediction_writer.stats()
+
+
+@router.post("/user-stats/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_stats(data: RebuildStatsRequest):
+    """
+    POST /admin/user-stats/rebuild
+    Recomputes dashboard stats from predictions and medications for one user
+    (user_id) or, if omitted, for every user.
+    """
+    if data.user_id:
+        await rebuild_user_stats(data.user_id)
+        return {"message": "User stats rebuilt", "users": 1}
+    return {"message": "User stats rebuilt", "users": await rebuild_all_user_stats()}
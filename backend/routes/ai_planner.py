@@ -1,18 +1,88 @@
 """
 AI Planner routes — generates workout plans and diet plans via OpenAI.
+The /stream variants send Server-Sent Events while GPT is still writing:
+  field  {"key", "value"}  top-level text such as plan_name
+  item   {"key", "value"}  one complete element, e.g. a day of weekly_plan or a meal
+  done   full saved plan (with id)
+  error  {"detail"}
+If the client disconnects mid-stream, the plan is generated and saved in the background.
 """
 
 from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from middleware.clerk_auth import get_current_user_id
 from models.ai_planner import WorkoutRequest, DietRequest
-from services.openai_service import generate_workout_plan, generate_diet_plan
+from services.openai_service import (
+    generate_workout_plan, generate_diet_plan, stream_workout_plan, stream_diet_plan,
+)
+from services.streaming import JsonStreamParser, sse_event, SSE_HEADERS
+from services.response_cache import cached_json, invalidate
+from services.recommendation_worker import run_in_background
 from database import get_db
 
 router = APIRouter(prefix="/generate", tags=["AI Planner"])
 
 
+async def _save_plan(collection, scope: str, user_id: str, request: dict, plan: dict) -> str:
+    """Persist a generated plan and return its id."""
+    record = {
+        "user_id": user_id,
+        "plan": plan,
+        "request": request,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    result = await collection.insert_one(record)
+    await invalidate(user_id, scope)
+    return str(result.inserted_id)
+
+
+async def _finish_plan(generate: Callable[[], Awaitable[dict]], collection, scope: str, user_id: str, request: dict):
+    """Generate and save a plan whose streaming client went away."""
+    try:
+        await _save_plan(collection, scope, user_id, request, await generate())
+    except Exception as e:
+        print(f"⚠️  Background {scope} plan generation failed for {user_id}: {e}")
+
+
+def _stream_plan(
+    chunks: AsyncIterator[str],
+    generate: Callable[[], Awaitable[dict]],
+    collection,
+    scope: str,
+    user_id: str,
+    request: dict,
+) -> StreamingResponse:
+    """
+    Forward plan pieces as SSE while GPT streams, then persist the full plan.
+    generate() produces the same plan without streaming; it finishes the job
+    in the background if the client disconnects before the plan is saved.
+    """
+
+    async def events():
+        parser = JsonStreamParser()
+        finished = False
+        try:
+            async for delta in chunks:
+                for kind, key, value in parser.feed(delta):
+                    yield sse_event(kind, {"key": key, "value": value})
+            plan = parser.result()
+            plan["id"] = await _save_plan(collection, scope, user_id, request, plan)
+            finished = True
+            yield sse_event("done", plan)
+        except Exception as e:
+            finished = True
+            yield sse_event("error", {"detail": f"Plan generation failed: {str(e)}"})
+        finally:
+            if not finished:
+                # Client went away mid-stream — generate and save the plan in the background
+                run_in_background(_finish_plan(generate, collection, scope, user_id, request))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @router.post("/workout")
 async def create_workout_plan(
     data: WorkoutRequest,
@@ -41,14 +111,41 @@ async def create_workout_plan(
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
         result = await db.workout_plans.insert_one(record)
+        await invalidate(user_id, "workouts")
         plan["id"] = str(result.inserted_id)
         return plan
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Workout generation failed: {str(e)}")
 
 
+@router.post("/workout/stream")
+async def stream_workout(
+    data: WorkoutRequest,
+    user_id: str = Depends(get_current_user_id),
+    db=Depends(get_db),
+):
+    """
+    POST /generate/workout/stream
+    Streams the workout plan over SSE, one day at a time, and persists it when complete.
+    """
+    params = dict(
+        age=data.age,
+        heart_risk=data.heart_risk,
+        equipment=data.equipment,
+        injuries=data.injuries or "",
+        fitness_goal=data.fitness_goal,
+        fitness_level=data.fitness_level or "beginner",
+    )
+    return _stream_plan(
+        stream_workout_plan(**params),
+        lambda: generate_workout_plan(**params),
+        db.workout_plans, "workouts", user_id, data.model_dump(),
+    )
+
+
 @router.get("/workouts")
 async def list_workout_plans(
+    request: Request,
     limit: int = 20,
     user_id: str = Depends(get_current_user_id),
     db=Depends(get_db),
@@ -57,21 +154,25 @@ async def list_workout_plans(
     GET /generate/workouts
     Returns all saved workout plans for the current user (summary, newest first).
     """
-    cursor = db.workout_plans.find(
-        {"user_id": user_id},
-        {"plan.plan_name": 1, "plan.description": 1, "request": 1, "created_at": 1},
-    ).sort("created_at", -1).limit(limit)
 
-    plans = []
-    async for doc in cursor:
-        plans.append({
-            "id": str(doc["_id"]),
-            "plan_name": doc.get("plan", {}).get("plan_name", "Workout Plan"),
-            "description": doc.get("plan", {}).get("description", ""),
-            "request": doc.get("request", {}),
-            "created_at": doc.get("created_at"),
-        })
-    return plans
+    async def build():
+        cursor = db.workout_plans.find(
+            {"user_id": user_id},
+            {"plan.plan_name": 1, "plan.description": 1, "request": 1, "created_at": 1},
+        ).sort("created_at", -1).limit(limit)
+
+        plans = []
+        async for doc in cursor:
+            plans.append({
+                "id": str(doc["_id"]),
+                "plan_name": doc.get("plan", {}).get("plan_name", "Workout Plan"),
+                "description": doc.get("plan", {}).get("description", ""),
+                "request": doc.get("request", {}),
+                "created_at": doc.get("created_at"),
+            })
+        return plans, {}
+
+    return await cached_json(request, user_id, ("workouts",), build)
 
 
 @router.get("/workout/{plan_id}")
@@ -128,14 +229,41 @@ async def create_diet_plan(
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
         result = await db.diet_plans.insert_one(record)
+        await invalidate(user_id, "diets")
         plan["id"] = str(result.inserted_id)
         return plan
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Diet generation failed: {str(e)}")
 
 
+@router.post("/diet/stream")
+async def stream_diet(
+    data: DietRequest,
+    user_id: str = Depends(get_current_user_id),
+    db=Depends(get_db),
+):
+    """
+    POST /generate/diet/stream
+    Streams the meal plan over SSE, one meal at a time, and persists it when complete.
+    """
+    params = dict(
+        age=data.age,
+        weight_kg=data.weight_kg,
+        height_cm=data.height_cm,
+        heart_risk=data.heart_risk,
+        dietary_restrictions=data.dietary_restrictions,
+        goal=data.goal,
+    )
+    return _stream_plan(
+        stream_diet_plan(**params),
+        lambda: generate_diet_plan(**params),
+        db.diet_plans, "diets", user_id, data.model_dump(),
+    )
+
+
 @router.get("/diets")
 async def list_diet_plans(
+    request: Request,
     limit: int = 20,
     user_id: str = Depends(get_current_user_id),
     db=Depends(get_db),
@@ -144,21 +272,25 @@ async def list_diet_plans(
     GET /generate/diets
     Returns all saved diet plans for the current user (summary, newest first).
     """
-    cursor = db.diet_plans.find(
-        {"user_id": user_id},
-        {"plan.plan_name": 1, "plan.daily_calories": 1, "request": 1, "created_at": 1},
-    ).sort("created_at", -1).limit(limit)
-
-    plans = []
-    async for doc in cursor:
-        plans.append({
-            "id": str(doc["_id"]),
-            "plan_name": doc.get("plan", {}).get("plan_name", "Diet Plan"),
-            "daily_calories": doc.get("plan", {}).get("daily_calories"),
-            "request": doc.get("request", {}),
-            "created_at": doc.get("created_at"),
-        })
-    return plans
+
+    async def build():
+        cursor = db.diet_plans.find(
+            {"user_id": user_id},
+            {"plan.plan_name": 1, "plan.daily_calories": 1, "request": 1, "created_at": 1},
+        ).sort("created_at", -1).limit(limit)
+
+        plans = []
+        async for doc in cursor:
+            plans.append({
+                "id": str(doc["_id"]),
+                "plan_name": doc.get("plan", {}).get("plan_name", "Diet Plan"),
+                "daily_calories": doc.get("plan", {}).get("daily_calories"),
+                "request": doc.get("request", {}),
+                "created_at": doc.get("created_at"),
+            })
+        return plans, {}
+
+    return await cached_json(request, user_id, ("diets",), build)
 
 
 @router.get("/diet/{plan_id}")
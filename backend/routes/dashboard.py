@@ -1,32 +1,82 @@
 """
-Dashboard routes — risk history and progress trends.
+Dashboard routes — risk history, progress trends and dose adherence.
+Responses are cached per user and invalidated by prediction and
+medication writes (see services/response_cache.py).
 """
 
-from fastapi import APIRouter, Depends, Query
+import base64
+import asyncio
+from typing import Optional
+from datetime import date, datetime
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from database import get_db
 from middleware.clerk_auth import get_current_user_id
+from services.user_stats import get_user_stats
+from services.risk_rollup import get_daily_risk
+from services.dose_events import adherence_buckets, adherence_summary
+from services.response_cache import cached_json
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 
-@router.get("/risk-history")
-async def get_risk_history(
-    limit: int = Query(default=20, ge=1, le=100),
-    user_id: str = Depends(get_current_user_id),
-):
-    """
-    GET /dashboard/risk-history
-    Returns the user's recent prediction results for the dashboard.
-    """
+# Server-side projection: everything the history list shows, minus the
+# recommendations body, which is reduced to a boolean flag
+HISTORY_PROJECTION = {
+    "probability": 1,
+    "risk_percentage": 1,
+    "risk_category": 1,
+    "confidence_score": 1,
+    "input_data": 1,
+    "created_at": 1,
+    "has_recommendations": {
+        "$and": [
+            {"$ifNull": ["$recommendations", False]},
+            {"$ne": ["$recommendations", {}]},
+        ]
+    },
+}
+
+
+def encode_cursor(created_at: datetime, oid: ObjectId) -> str:
+    """Opaque keyset cursor for the (created_at, _id) position of a document."""
+    raw = f"{created_at.isoformat()}|{oid}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        created_at, oid = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _history_page(user_id: str, limit: int, cursor: str | None = None) -> tuple[list[dict], str | None]:
+    """One page of risk history, newest first, plus the cursor of the next page (if any)."""
     db = get_db()
-    cursor = (
-        db.predictions.find({"user_id": user_id})
-        .sort("created_at", -1)
-        .limit(limit)
+    query: dict = {"user_id": user_id}
+    if cursor:
+        created_at, oid = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": oid}},
+        ]
+
+    # One extra document tells us whether another page exists
+    docs = await (
+        db.predictions.find(query, HISTORY_PROJECTION)
+        .sort([("created_at", -1), ("_id", -1)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
     )
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"])
 
     history = []
-    async for doc in cursor:
+    for doc in docs:
         history.append({
             "id": str(doc["_id"]),
             "probability": doc["probability"],
@@ -34,92 +84,161 @@ async def get_risk_history(
             "risk_category": doc["risk_category"],
             "confidence_score": doc["confidence_score"],
             "input_data": doc.get("input_data", {}),
-            "has_recommendations": bool(doc.get("recommendations")),
+            "has_recommendations": bool(doc.get("has_recommendations")),
             "created_at": doc["created_at"].isoformat(),
         })
+    return history, next_cursor
+
+
+async def _progress_trend(user_id: str, days: int) -> list[dict]:
+    results = []
+    for doc in await get_daily_risk(user_id, days):
+        results.append({
+            "date": doc["day"],
+            "avg_risk": round(doc["sum"] / doc["count"], 2),
+            "min_risk": round(doc["min"], 2),
+            "max_risk": round(doc["max"], 2),
+            "assessment_count": doc["count"],
+        })
+    return results
+
+
+async def _dashboard_stats(user_id: str) -> dict:
+    doc, doses = await asyncio.gather(get_user_stats(user_id), adherence_summary(user_id))
+
+    latest = doc.get("latest_risk")
+    total_meds = doc.get("medications_total", 0)
+    taken_meds = doc.get("medications_taken", 0)
+    stats = {
+        "latest_risk": {
+            "percentage": latest["percentage"] if latest else None,
+            "category": latest["category"] if latest else None,
+            "date": latest["date"].isoformat() if latest else None,
+        },
+        "total_assessments": doc.get("total_assessments", 0),
+        # Dose-level 30-day rate from the adherence_daily rollup; today's
+        # taken/total medications until any dose has been recorded
+        "medication_adherence": {
+            "total": total_meds,
+            "taken": taken_meds,
+            "rate": doses["rate"] if doses["doses"] else (
+                round(taken_meds / total_meds * 100, 1) if total_meds > 0 else 0
+            ),
+            "doses": doses["doses"],
+            "on_time_rate": doses["on_time_rate"],
+            "window_days": doses["window_days"],
+        },
+    }
+
+    # BMI from latest prediction
+    if latest:
+        stats["latest_bmi"] = doc.get("latest_bmi")
+
+    return stats
+
+
+@router.get("/risk-history")
+async def get_risk_history(
+    request: Request,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    GET /dashboard/risk-history
+    Returns the user's prediction results for the dashboard, newest first.
+    Keyset-paginated on (created_at, _id): when more results exist, the
+    X-Next-Cursor response header holds the cursor for the next page.
+    """
 
-    return history
+    async def build():
+        history, next_cursor = await _history_page(user_id, limit, cursor)
+        return history, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+    return await cached_json(request, user_id, ("predictions",), build)
 
 
 @router.get("/progress-trend")
 async def get_progress_trend(
+    request: Request,
+    days: int = Query(default=30, ge=1, le=365),
     user_id: str = Depends(get_current_user_id),
 ):
     """
     GET /dashboard/progress-trend
-    Returns aggregated trend data for the progress chart.
-    Groups predictions by date and returns average risk per day.
+    Returns aggregated trend data for the progress chart: average, min and
+    max risk per day for the user's most recent `days` days with assessments,
+    read from the pre-aggregated risk_daily rollup.
     """
-    db = get_db()
-    pipeline = [
-        {"$match": {"user_id": user_id}},
-        {"$sort": {"created_at": 1}},
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}
-                },
-                "avg_risk": {"$avg": "$risk_percentage"},
-                "count": {"$sum": 1},
-                "min_risk": {"$min": "$risk_percentage"},
-                "max_risk": {"$max": "$risk_percentage"},
-            }
-        },
-        {"$sort": {"_id": 1}},
-        {"$limit": 30},
-    ]
 
-    results = []
-    async for doc in db.predictions.aggregate(pipeline):
-        results.append({
-            "date": doc["_id"],
-            "avg_risk": round(doc["avg_risk"], 2),
-            "min_risk": round(doc["min_risk"], 2),
-            "max_risk": round(doc["max_risk"], 2),
-            "assessment_count": doc["count"],
-        })
+    async def build():
+        return await _progress_trend(user_id, days), {}
 
-    return results
+    return await cached_json(request, user_id, ("predictions",), build)
 
 
 @router.get("/stats")
-async def get_dashboard_stats(user_id: str = Depends(get_current_user_id)):
+async def get_dashboard_stats(request: Request, user_id: str = Depends(get_current_user_id)):
     """
     GET /dashboard/stats
     Returns summary statistics for the dashboard overview cards.
+    Reads the user's materialized user_stats document (one lookup by _id).
     """
-    db = get_db()
 
-    # Latest prediction
-    latest = await db.predictions.find_one(
-        {"user_id": user_id}, sort=[("created_at", -1)]
-    )
+    async def build():
+        return await _dashboard_stats(user_id), {}
 
-    # Total predictions
-    total_predictions = await db.predictions.count_documents({"user_id": user_id})
+    return await cached_json(request, user_id, ("predictions", "medications"), build,
+                             vary=date.today().isoformat())
 
-    # Medication adherence
-    total_meds = await db.medications.count_documents({"user_id": user_id})
-    taken_meds = await db.medications.count_documents(
-        {"user_id": user_id, "adherence_status": True}
-    )
 
-    stats = {
-        "latest_risk": {
-            "percentage": latest["risk_percentage"] if latest else None,
-            "category": latest["risk_category"] if latest else None,
-            "date": latest["created_at"].isoformat() if latest else None,
-        },
-        "total_assessments": total_predictions,
-        "medication_adherence": {
-            "total": total_meds,
-            "taken": taken_meds,
-            "rate": round(taken_meds / total_meds * 100, 1) if total_meds > 0 else 0,
-        },
-    }
+@router.get("/overview")
+async def get_dashboard_overview(
+    request: Request,
+    history_limit: int = Query(default=10, ge=1, le=100),
+    days: int = Query(default=30, ge=1, le=365),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    GET /dashboard/overview
+    Everything the dashboard page needs in one request: stats, the first
+    page of risk history and the progress trend. The three index-backed
+    reads run concurrently, so the cost is one round trip.
+    """
 
-    # BMI from latest prediction
-    if latest and "input_data" in latest:
-        stats["latest_bmi"] = latest["input_data"].get("bmi")
+    async def build():
+        stats, (history, next_cursor), trend = await asyncio.gather(
+            _dashboard_stats(user_id),
+            _history_page(user_id, history_limit),
+            _progress_trend(user_id, days),
+        )
+        return {
+            "stats": stats,
+            "history": history,
+            "history_next_cursor": next_cursor,
+            "trend": trend,
+        }, {}
+
+    return await cached_json(request, user_id, ("predictions", "medications"), build,
+                             vary=date.today().isoformat())
+
+
+@router.get("/adherence")
+async def get_adherence(
+    request: Request,
+    period: str = Query(default="daily", pattern="^(daily|weekly|monthly)$"),
+    limit: int = Query(default=30, ge=1, le=366),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    GET /dashboard/adherence?period=daily|weekly|monthly
+    Dose adherence for the user's last `limit` periods, oldest first: doses
+    taken / skipped / missed, adherence rate and on-time percentage. Weekly
+    and monthly buckets are grouped from the adherence_daily rollup by an
+    aggregation that range-scans the (user_id, day) index.
+    """
 
-    return stats
+    async def build():
+        return await adherence_buckets(user_id, period, limit), {}
+
+    return await cached_json(request, user_id, ("medications",), build, vary=date.today().isoformat())
@@ -3,49 +3,57 @@ Medication routes — CRUD for medication reminders.
 Phone number is read from the user profile (not per-medication).
 """
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
 from datetime import datetime, date
-from bson import ObjectId
+from bson import Binary, ObjectId
+from pymongo import ReturnDocument
 from database import get_db
 from middleware.clerk_auth import get_current_user_id
 from models.medication import MedicationCreate, MedicationUpdate, ToggleSMSRequest
 from services.scheduler_service import schedule_medication_reminders, cancel_medication_reminders
+from services.user_stats import adjust_medications
+from services.response_cache import cached_json, invalidate
+from services import adherence, dose_events
 
 router = APIRouter(prefix="/medications", tags=["Medications"])
 
 
 def serialize_med(doc: dict) -> dict:
-    """Convert MongoDB document to JSON-safe dict."""
+    """Convert MongoDB document to JSON-safe dict (stored streak, 30-day rate from the bitmap)."""
+    doc["streak"] = adherence.current_streak(doc)
+    doc["adherence_rate"] = adherence.rate(*adherence.read(doc))
+    for field in ("adherence_bits", "adherence_origin", "taken_dates"):
+        doc.pop(field, None)
     doc["id"] = str(doc["_id"])
     del doc["_id"]
     return doc
 
 
-def compute_streak(taken_dates: list, start_date_str: str | None = None) -> int:
-    """Compute consecutive-day streak ending at today."""
-    if not taken_dates:
-        return 0
-    today = date.today()
-    dates_set = set()
-    for d in taken_dates:
-        try:
-            dates_set.add(datetime.strptime(d, "%Y-%m-%d").date())
-        except ValueError:
-            pass
-    streak = 0
-    check = today
-    while check in dates_set:
-        streak += 1
-        check = date.fromordinal(check.toordinal() - 1)
-    return streak
-
-
 async def _get_user_phone(db, user_id: str) -> str | None:
     """Fetch phone number from the user profile."""
     user = await db.users.find_one({"clerk_id": user_id})
     return user.get("phone_number") if user else None
 
 
+def _dose_filter(oid: ObjectId, user_id: str, scheduled_time: str | None) -> dict:
+    """Match the user's medication (and, if given, one of its scheduled dose times)."""
+    query = {"_id": oid, "user_id": user_id}
+    if scheduled_time:
+        query["time_schedule"] = scheduled_time
+    return query
+
+
+async def _record_dose(user_id: str, med: dict, scheduled_time: str | None, status: str):
+    """Log the dose outcome; without an explicit time, the dose nearest to now is used."""
+    dose = scheduled_time or dose_events.nearest_dose(med.get("time_schedule", []), datetime.now())
+    if dose and not dose_events.parse_time(dose):
+        # Legacy free-form schedule entry: the medication update stands, the dose isn't logged
+        print(f"⚠️  Not logging dose with invalid time '{dose}' of medication {med['_id']}")
+        return
+    if dose:
+        await dose_events.record_dose(user_id, str(med["_id"]), dose.strip(), status)
+
+
 @router.post("", status_code=201)
 async def add_medication(
     data: MedicationCreate,
@@ -69,13 +77,17 @@ async def add_medication(
         "last_taken": None,
         "sms_reminders_enabled": False,
         "reminder_job_ids": [],
-        "taken_dates": [],
+        "adherence_origin": (adherence.parse_day(data.start_date) or date.today()).isoformat(),
+        "adherence_bits": Binary(b""),
+        "last_taken_day": None,
         "streak": 0,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
     }
     result = await db.medications.insert_one(doc)
     med_id = str(result.inserted_id)
+    await adjust_medications(user_id, total=1)
+    await invalidate(user_id, "medications")
 
     # Schedule SMS reminders if requested (phone comes from user profile)
     job_ids = []
@@ -93,72 +105,107 @@ async def add_medication(
                 {"$set": {"sms_reminders_enabled": True, "reminder_job_ids": job_ids}},
             )
 
-    doc["id"] = med_id
+    if job_ids:
+        await invalidate(user_id, "medications")
+
     doc["sms_reminders_enabled"] = bool(job_ids)
     doc["reminder_job_ids"] = job_ids
-    del doc["_id"]
-    return doc
+    return serialize_med(doc)
 
 
 @router.get("")
-async def get_medications(user_id: str = Depends(get_current_user_id)):
-    """GET /medications — list all medications for the current user."""
-    db = get_db()
-    cursor = db.medications.find({"user_id": user_id}).sort("created_at", -1)
-    meds = []
-    async for doc in cursor:
-        # Recompute streak on read
-        doc["streak"] = compute_streak(
-            doc.get("taken_dates", []),
-            doc.get("start_date"),
-        )
-        meds.append(serialize_med(doc))
-    return meds
+async def get_medications(request: Request, user_id: str = Depends(get_current_user_id)):
+    """GET /medications — list all medications for the current user (cached per user)."""
+
+    async def build():
+        db = get_db()
+        cursor = db.medications.find({"user_id": user_id}).sort("created_at", -1)
+        meds = []
+        async for doc in cursor:
+            # Streak and rate are computed from the adherence bitmap on read
+            meds.append(serialize_med(doc))
+        return meds, {}
+
+    # Streaks depend on today's date, so the cached list expires at midnight
+    return await cached_json(request, user_id, ("medications",), build, vary=date.today().isoformat())
 
 
 @router.put("/{med_id}/take")
-async def mark_taken(med_id: str, user_id: str = Depends(get_current_user_id)):
-    """PUT /medications/{id}/take — mark a medication as taken today."""
+async def mark_taken(
+    med_id: str,
+    scheduled_time: str | None = None,
+    user_id: str = Depends(get_current_user_id),
+):
+    """PUT /medications/{id}/take?scheduled_time=HH:MM — mark a medication (dose) as taken today."""
     db = get_db()
     try:
         oid = ObjectId(med_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid medication ID")
 
-    today_str = date.today().isoformat()
+    # Compare-and-swap on the bitmap so concurrent takes can't drop each other's bits
+    for _ in range(5):
+        current = await db.medications.find_one(
+            _dose_filter(oid, user_id, scheduled_time),
+            {"adherence_bits": 1, "adherence_origin": 1, "taken_dates": 1, "start_date": 1, "time_schedule": 1},
+        )
+        if current is None:
+            raise HTTPException(status_code=404, detail="Medication not found")
+        today = date.today()
+        origin, bits = adherence.read(current)
+        origin, bits = adherence.set_day(origin or today, bits, today)
+
+        # Pipeline update: bitmap, status and streak change together in one atomic write
+        before = await db.medications.find_one_and_update(
+            {"_id": oid, "adherence_bits": current.get("adherence_bits")},
+            adherence.take_pipeline(today, origin, bits, datetime.utcnow()),
+            projection={"adherence_status": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if before is not None:
+            break
+    else:
+        raise HTTPException(status_code=409, detail="Medication was updated concurrently, please retry")
 
-    result = await db.medications.update_one(
-        {"_id": oid, "user_id": user_id},
-        {
-            "$set": {
-                "adherence_status": True,
-                "last_taken": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            },
-            "$addToSet": {"taken_dates": today_str},
-        },
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Medication not found")
+    if not before.get("adherence_status"):
+        await adjust_medications(user_id, taken=1)
+    await _record_dose(user_id, current, scheduled_time, "taken")
+    await invalidate(user_id, "medications")
 
     return {"message": "Medication marked as taken"}
 
 
+async def _clear_adherence(db, query: dict, user_id: str) -> dict | None:
+    """Set adherence_status to False; returns the previous document (None if it doesn't exist)."""
+    before = await db.medications.find_one_and_update(
+        query,
+        {"$set": {"adherence_status": False, "updated_at": datetime.utcnow()}},
+        projection={"adherence_status": 1, "time_schedule": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is not None and before.get("adherence_status"):
+        await adjust_medications(user_id, taken=-1)
+    return before
+
+
 @router.put("/{med_id}/skip")
-async def skip_medication(med_id: str, user_id: str = Depends(get_current_user_id)):
-    """PUT /medications/{id}/skip — skip medication for today (not taken, no streak break)."""
+async def skip_medication(
+    med_id: str,
+    scheduled_time: str | None = None,
+    user_id: str = Depends(get_current_user_id),
+):
+    """PUT /medications/{id}/skip?scheduled_time=HH:MM — skip medication (dose) for today (no streak break)."""
     db = get_db()
     try:
         oid = ObjectId(med_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid medication ID")
 
-    result = await db.medications.update_one(
-        {"_id": oid, "user_id": user_id},
-        {"$set": {"adherence_status": False, "updated_at": datetime.utcnow()}},
-    )
-    if result.matched_count == 0:
+    before = await _clear_adherence(db, _dose_filter(oid, user_id, scheduled_time), user_id)
+    if before is None:
         raise HTTPException(status_code=404, detail="Medication not found")
+    await _record_dose(user_id, before, scheduled_time, "skipped")
+    await invalidate(user_id, "medications")
 
     return {"message": "Medication skipped for today"}
 
@@ -172,12 +219,9 @@ async def reset_taken(med_id: str, user_id: str = Depends(get_current_user_id)):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid medication ID")
 
-    result = await db.medications.update_one(
-        {"_id": oid, "user_id": user_id},
-        {"$set": {"adherence_status": False, "updated_at": datetime.utcnow()}},
-    )
-    if result.matched_count == 0:
+    if await _clear_adherence(db, {"_id": oid, "user_id": user_id}, user_id) is None:
         raise HTTPException(status_code=404, detail="Medication not found")
+    await invalidate(user_id, "medications")
 
     return {"message": "Medication adherence reset"}
 
@@ -239,8 +283,8 @@ async def update_medication(
             {"$set": {"reminder_job_ids": new_job_ids}},
         )
 
+    await invalidate(user_id, "medications")
     doc = await db.medications.find_one({"_id": oid})
-    doc["streak"] = compute_streak(doc.get("taken_dates", []), doc.get("start_date"))
     return serialize_med(doc)
 
 
@@ -260,7 +304,10 @@ async def delete_medication(med_id: str, user_id: str = Depends(get_current_user
     if med.get("reminder_job_ids"):
         cancel_medication_reminders(med["reminder_job_ids"])
 
-    await db.medications.delete_one({"_id": oid})
+    result = await db.medications.delete_one({"_id": oid})
+    if result.deleted_count:
+        await adjust_medications(user_id, total=-1, taken=-1 if med.get("adherence_status") else 0)
+        await invalidate(user_id, "medications")
     return {"message": "Medication deleted"}
 
 
@@ -316,6 +363,7 @@ async def toggle_sms_reminder(
             }
         },
     )
+    await invalidate(user_id, "medications")
     return {
         "message": "Reminders updated",
         "enabled": data.enabled and bool(job_ids),
@@ -3,17 +3,33 @@ Prediction routes — heart disease risk prediction using the ML model.
 Every prediction is stored in MongoDB for history tracking.
 """
 
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
 from datetime import datetime
 from database import get_db
 from middleware.clerk_auth import get_current_user_id
-from models.prediction import PredictionInput, PredictionOutput, PredictionRecord, Recommendations
-from services.ml_service import predict
-from services.openai_service import generate_risk_recommendations
+from models.prediction import (
+    PredictionInput, PredictionOutput, PredictionRecord, Recommendations,
+    BatchPredictionInput, BatchPredictionOutput,
+)
+from services.ml_service import predict_batch
+from services.inference_scheduler import inference_scheduler
+from services.openai_service import generate_risk_recommendations, stream_risk_recommendations
+from services.recommendation_worker import schedule_recommendations, wait_for_recommendations
+from services.streaming import JsonStreamParser, sse_event, SSE_HEADERS
+from services.prediction_writer import prediction_writer
+from services.response_cache import invalidate
 
 router = APIRouter(prefix="/predict", tags=["Prediction"])
 
+# Cap concurrent GPT calls when a batch asks for recommendations
+BATCH_RECOMMENDATION_CONCURRENCY = 8
+
+# Longest an SSE client is kept waiting for recommendations
+RECOMMENDATION_STREAM_TIMEOUT = 120
+
 
 @router.post("/risk", response_model=PredictionOutput)
 async def predict_risk(
@@ -24,28 +40,35 @@ async def predict_risk(
     POST /predict/risk
     Runs the RandomForest model and returns heart disease probability,
     risk category, and confidence score. Stores result in MongoDB.
+    AI recommendations are generated in the background: the response has
+    recommendations_status="pending" and clients poll GET /predict/risk/{id}
+    or subscribe to GET /predict/risk/{id}/events.
     """
+    result = await _predict_and_store(data, user_id)
+
+    # Personalized AI recommendations are filled in later (failure is graceful)
+    schedule_recommendations(
+        result.id,
+        user_id,
+        inputs=data.model_dump(),
+        risk_category=result.risk_category,
+        risk_percentage=result.risk_percentage,
+        risk_drivers=[d.model_dump() for d in result.risk_drivers or []],
+    )
+    return result
+
+
+async def _predict_and_store(data: PredictionInput, user_id: str) -> PredictionOutput:
+    """Run the model and store the prediction with recommendations pending."""
     try:
-        result = predict(data)
+        # Micro-batched in a worker thread so the event loop stays free
+        result = await inference_scheduler.submit(data, explain=True)
     except RuntimeError as e:
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-    # Generate personalized AI recommendations (non-blocking — failure is graceful)
-    recommendations = None
-    try:
-        rec_data = await generate_risk_recommendations(
-            inputs=data.model_dump(),
-            risk_category=result.risk_category,
-            risk_percentage=result.risk_percentage,
-        )
-        recommendations = Recommendations(**rec_data)
-    except Exception as rec_err:
-        print(f"⚠️  Recommendations generation failed: {rec_err}")
-
-    # Store in MongoDB for dashboard history
-    db = get_db()
+    # Store in MongoDB for dashboard history (write-behind, off the request path)
     record = PredictionRecord(
         user_id=user_id,
         input_data=data.model_dump(),
@@ -53,15 +76,164 @@ async def predict_risk(
         risk_percentage=result.risk_percentage,
         risk_category=result.risk_category,
         confidence_score=result.confidence_score,
-        recommendations=recommendations.model_dump() if recommendations else None,
+        recommendations=None,
+        recommendations_status="pending",
+        model_version=result.model_version,
         created_at=datetime.utcnow(),
     )
-    inserted = await db.predictions.insert_one(record.model_dump())
+    try:
+        oid = await prediction_writer.add(record.model_dump())
+    except RuntimeError as e:
+        # Write-behind buffer full and not draining (MongoDB unreachable)
+        raise HTTPException(status_code=503, detail=str(e))
 
-    result.recommendations = recommendations
+    result.id = str(oid)
+    result.recommendations_status = "pending"
     return result
 
 
+@router.post("/risk/stream")
+async def predict_risk_stream(
+    data: PredictionInput,
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    POST /predict/risk/stream
+    Same prediction as POST /predict/risk, but answered as Server-Sent Events:
+      prediction  the PredictionOutput (sent immediately)
+      field/item  recommendation pieces as GPT writes them (summary, each risk factor, ...)
+      done        the complete recommendations, saved on the prediction
+      error       {"detail"} if generation failed
+    If the client disconnects early, generation finishes in the background.
+    """
+    result = await _predict_and_store(data, user_id)
+    oid = ObjectId(result.id)
+    inputs = data.model_dump()
+    risk_drivers = [d.model_dump() for d in result.risk_drivers or []]
+
+    async def events():
+        finished = False
+        try:
+            yield sse_event("prediction", result.model_dump())
+            parser = JsonStreamParser()
+            try:
+                async for delta in stream_risk_recommendations(
+                    inputs=inputs,
+                    risk_category=result.risk_category,
+                    risk_percentage=result.risk_percentage,
+                    risk_drivers=risk_drivers,
+                ):
+                    for kind, key, value in parser.feed(delta):
+                        yield sse_event(kind, {"key": key, "value": value})
+                recommendations = Recommendations(**parser.result()).model_dump()
+            except Exception as rec_err:
+                print(f"⚠️  Recommendations generation failed for {result.id}: {rec_err}")
+                await prediction_writer.update(oid, {"recommendations_status": "failed"})
+                await invalidate(user_id, "predictions")
+                finished = True
+                yield sse_event("error", {"detail": "Recommendations generation failed"})
+                return
+
+            await prediction_writer.update(oid, {"recommendations": recommendations, "recommendations_status": "ready"})
+            await invalidate(user_id, "predictions")
+            finished = True
+            yield sse_event("done", recommendations)
+        finally:
+            if not finished:
+                # Client went away mid-stream — let the background worker complete the record
+                schedule_recommendations(
+                    result.id,
+                    user_id,
+                    inputs=inputs,
+                    risk_category=result.risk_category,
+                    risk_percentage=result.risk_percentage,
+                    risk_drivers=risk_drivers,
+                )
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/risk/batch", response_model=BatchPredictionOutput)
+async def predict_risk_batch(
+    data: BatchPredictionInput,
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    POST /predict/risk/batch
+    Scores a whole cohort with one model call and stores all results
+    with a single insert_many. Recommendations are opt-in per batch.
+    """
+    try:
+        results = await asyncio.to_thread(predict_batch, data.rows, data.include_risk_drivers)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+    recommendations: list[Recommendations | None] = [None] * len(results)
+    if data.include_recommendations:
+        semaphore = asyncio.Semaphore(BATCH_RECOMMENDATION_CONCURRENCY)
+
+        async def _recommend(row: PredictionInput, result: PredictionOutput):
+            async with semaphore:
+                rec_data = await generate_risk_recommendations(
+                    inputs=row.model_dump(),
+                    risk_category=result.risk_category,
+                    risk_percentage=result.risk_percentage,
+                    risk_drivers=[d.model_dump() for d in result.risk_drivers or []],
+                )
+            return Recommendations(**rec_data)
+
+        outcomes = await asyncio.gather(
+            *(_recommend(row, result) for row, result in zip(data.rows, results)),
+            return_exceptions=True,
+        )
+        for i, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                print(f"⚠️  Recommendations generation failed for row {i}: {outcome}")
+            else:
+                recommendations[i] = outcome
+
+    # Store every row for dashboard history in one round trip
+    db = get_db()
+    now = datetime.utcnow()
+    records = []
+    for row, result, rec in zip(data.rows, results, recommendations):
+        records.append(PredictionRecord(
+            user_id=user_id,
+            input_data=row.model_dump(),
+            probability=result.probability,
+            risk_percentage=result.risk_percentage,
+            risk_category=result.risk_category,
+            confidence_score=result.confidence_score,
+            recommendations=rec.model_dump() if rec else None,
+            recommendations_status="ready" if rec else ("failed" if data.include_recommendations else None),
+            model_version=result.model_version,
+            created_at=now,
+        ).model_dump())
+        result.recommendations = rec
+    inserted = await db.predictions.insert_many(records)
+    await prediction_writer.notify_written(records)
+
+    prediction_ids = [str(oid) for oid in inserted.inserted_ids]
+    for result, prediction_id in zip(results, prediction_ids):
+        result.id = prediction_id
+
+    return BatchPredictionOutput(
+        count=len(results),
+        prediction_ids=prediction_ids,
+        results=results,
+    )
+
+
+async def _find_prediction(oid: ObjectId, user_id: str, projection: dict | None = None) -> dict | None:
+    """Read-your-writes lookup: the write-behind buffer first, then MongoDB."""
+    doc = prediction_writer.get(oid)
+    if doc is not None:
+        return doc if doc.get("user_id") == user_id else None
+    return await get_db().predictions.find_one({"_id": oid, "user_id": user_id}, projection)
+
+
 @router.get("/risk/{prediction_id}")
 async def get_prediction(
     prediction_id: str,
@@ -71,13 +243,12 @@ async def get_prediction(
     GET /predict/risk/{id}
     Fetch a single saved prediction (including recommendations) by its MongoDB ID.
     """
-    db = get_db()
     try:
         oid = ObjectId(prediction_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid prediction ID")
 
-    doc = await db.predictions.find_one({"_id": oid, "user_id": user_id})
+    doc = await _find_prediction(oid, user_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Prediction not found")
 
@@ -89,5 +260,47 @@ async def get_prediction(
         "confidence_score": doc["confidence_score"],
         "input_data": doc.get("input_data", {}),
         "recommendations": doc.get("recommendations"),
+        "recommendations_status": doc.get("recommendations_status", "ready" if doc.get("recommendations") else None),
+        "model_version": doc.get("model_version"),
         "created_at": doc["created_at"].isoformat(),
     }
+
+
+@router.get("/risk/{prediction_id}/events")
+async def stream_recommendations(
+    prediction_id: str,
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    GET /predict/risk/{id}/events
+    Server-Sent Events stream that emits one "recommendations" event once
+    background generation finishes (or a "timeout" event), then closes.
+    """
+    db = get_db()
+    try:
+        oid = ObjectId(prediction_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid prediction ID")
+
+    projection = {"recommendations": 1, "recommendations_status": 1}
+    if not await _find_prediction(oid, user_id, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Prediction not found")
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + RECOMMENDATION_STREAM_TIMEOUT
+        while True:
+            doc = prediction_writer.get(oid) or await db.predictions.find_one({"_id": oid}, projection)
+            status = doc.get("recommendations_status") if doc else "failed"
+            if status != "pending":
+                payload = {"status": status, "recommendations": doc.get("recommendations") if doc else None}
+                yield sse_event("recommendations", payload)
+                return
+            if loop.time() >= deadline:
+                yield sse_event("timeout", {"status": "pending"})
+                return
+            # Comment line keeps proxies from closing an idle connection
+            yield ": waiting\n\n"
+            await wait_for_recommendations(prediction_id, timeout=2.0)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
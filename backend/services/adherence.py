@@ -0,0 +1,201 @@
+"""
+Adherence bitmap — compact per-medication record of the days a dose was taken.
+Bit i of `adherence_bits` (BSON binary, little-endian within each byte) is
+set when the medication was taken on day `adherence_origin + i`, where
+adherence_origin ("YYYY-MM-DD") is fixed when the medication is created.
+A year of history is 46 bytes, setting a day is a single bit operation,
+and streak/rate are computed on whole machine words via Python ints
+instead of parsing one date string per day taken.
+The current streak and last_taken_day are also stored on the document:
+/take extends or restarts the streak atomically and a nightly job zeroes
+streaks whose last taken day is before yesterday, so reads do no work.
+
+Migrate legacy taken_dates lists (and fill in streak fields) from backend/:
+  python -m services.adherence
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta
+from bson import Binary
+
+
+def parse_day(value: str | None) -> date | None:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        return None
+
+
+def set_day(origin: date, bits: bytes, day: date) -> tuple[date, bytes]:
+    """Mark `day` as taken; returns the (possibly re-based) origin and bitmap."""
+    offset = day.toordinal() - origin.toordinal()
+    if offset < 0:
+        # Day before the origin: prepend whole bytes so existing bits keep their byte alignment
+        pad = (-offset + 7) // 8
+        bits = bytes(pad) + bits
+        origin = date.fromordinal(origin.toordinal() - pad * 8)
+        offset += pad * 8
+    buffer = bytearray(bits)
+    if offset // 8 >= len(buffer):
+        buffer.extend(bytes(offset // 8 - len(buffer) + 1))
+    buffer[offset // 8] |= 1 << (offset % 8)
+    return origin, bytes(buffer)
+
+
+def from_dates(days: list[str], origin: date | None = None) -> tuple[date | None, bytes]:
+    """Build a bitmap from "YYYY-MM-DD" strings (used by the migration)."""
+    parsed = sorted(d for d in (parse_day(s) for s in days) if d)
+    if not parsed:
+        return origin, b""
+    origin = min(origin, parsed[0]) if origin else parsed[0]
+    bits = b""
+    for day in parsed:
+        origin, bits = set_day(origin, bits, day)
+    return origin, bits
+
+
+def _window(origin: date, bits: bytes, today: date) -> tuple[int, int]:
+    """The bitmap as an int truncated after today, plus today's bit index (-1 if before origin)."""
+    index = today.toordinal() - origin.toordinal()
+    if index < 0:
+        return 0, -1
+    value = int.from_bytes(bits, "little") & ((1 << (index + 1)) - 1)
+    return value, index
+
+
+def streak(origin: date | None, bits: bytes, today: date | None = None) -> int:
+    """Consecutive taken days ending today (0 if today isn't taken)."""
+    if origin is None or not bits:
+        return 0
+    value, index = _window(origin, bits, today or date.today())
+    if index < 0:
+        return 0
+    # Highest unset bit at or below today ends the run
+    gaps = ~value & ((1 << (index + 1)) - 1)
+    return index + 1 if gaps == 0 else index - gaps.bit_length() + 1
+
+
+def rate(origin: date | None, bits: bytes, days: int = 30, today: date | None = None) -> float:
+    """Percentage of the last `days` days (not before the origin) that were taken."""
+    if origin is None:
+        return 0.0
+    value, index = _window(origin, bits, today or date.today())
+    if index < 0:
+        return 0.0
+    span = min(days, index + 1)
+    recent = value >> (index + 1 - span)
+    return round(recent.bit_count() / span * 100, 1)
+
+
+def last_day(origin: date | None, bits: bytes) -> date | None:
+    """The most recent taken day in the bitmap."""
+    value = int.from_bytes(bits, "little")
+    if origin is None or value == 0:
+        return None
+    return date.fromordinal(origin.toordinal() + value.bit_length() - 1)
+
+
+def current_streak(doc: dict, today: date | None = None) -> int:
+    """The stored streak, or 0 if it was broken and the nightly reset hasn't run yet."""
+    if "last_taken_day" not in doc:
+        # Not migrated yet — derive it from the bitmap / taken_dates once
+        origin, bits = read(doc)
+        return streak(origin, bits, today)
+    yesterday = ((today or date.today()) - timedelta(days=1)).isoformat()
+    last = doc.get("last_taken_day")
+    return doc.get("streak", 0) if last and last >= yesterday else 0
+
+
+def take_pipeline(today: date, origin: date, bits: bytes, now: datetime) -> list[dict]:
+    """
+    Update pipeline for /take: sets today's bitmap and extends the streak if
+    the last taken day was yesterday, keeps it if already taken today, or
+    restarts it at 1. Documents not migrated yet (no last_taken_day) get
+    the streak their bitmap shows, which already includes today.
+    """
+    today_str = today.isoformat()
+    yesterday_str = (today - timedelta(days=1)).isoformat()
+    return [
+        {"$set": {
+            "streak": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": [{"$type": "$last_taken_day"}, "missing"]}, "then": streak(origin, bits, today)},
+                    {"case": {"$eq": ["$last_taken_day", today_str]}, "then": {"$ifNull": ["$streak", 1]}},
+                    {"case": {"$eq": ["$last_taken_day", yesterday_str]},
+                     "then": {"$add": [{"$ifNull": ["$streak", 0]}, 1]}},
+                ],
+                "default": 1,
+            }},
+            "last_taken_day": today_str,
+            "adherence_status": True,
+            "last_taken": now,
+            "updated_at": now,
+            "adherence_origin": origin.isoformat(),
+            "adherence_bits": {"$literal": Binary(bits)},
+        }},
+        {"$unset": "taken_dates"},
+    ]
+
+
+async def reset_broken_streaks(db, today: date | None = None) -> int:
+    """Zero every streak whose last taken day is before yesterday (nightly job)."""
+    yesterday = ((today or date.today()) - timedelta(days=1)).isoformat()
+    result = await db.medications.update_many(
+        {"streak": {"$gt": 0}, "last_taken_day": {"$lt": yesterday}},
+        {"$set": {"streak": 0}},
+    )
+    return result.modified_count
+
+
+def read(doc: dict) -> tuple[date | None, bytes]:
+    """A medication document's (origin, bitmap), converting legacy taken_dates on the fly."""
+    if "adherence_bits" in doc:
+        return parse_day(doc.get("adherence_origin")), bytes(doc["adherence_bits"])
+    return from_dates(doc.get("taken_dates", []), parse_day(doc.get("start_date")))
+
+
+async def migrate(db) -> int:
+    """Convert legacy taken_dates to bitmaps and fill in streak / last_taken_day."""
+    migrated = 0
+    cursor = db.medications.find(
+        {"$or": [{"adherence_bits": {"$exists": False}}, {"last_taken_day": {"$exists": False}}]},
+        {"taken_dates": 1, "start_date": 1, "created_at": 1, "adherence_bits": 1, "adherence_origin": 1},
+    )
+    async for doc in cursor:
+        if "adherence_bits" in doc:
+            origin, bits = read(doc)
+            origin = origin or date.today()
+        else:
+            origin = parse_day(doc.get("start_date")) or (doc.get("created_at") or datetime.utcnow()).date()
+            origin, bits = from_dates(doc.get("taken_dates", []), origin)
+        last = last_day(origin, bits)
+        await db.medications.update_one(
+            {"_id": doc["_id"], "adherence_bits": doc.get("adherence_bits")},
+            {
+                "$set": {
+                    "adherence_origin": origin.isoformat(),
+                    "adherence_bits": Binary(bits),
+                    "last_taken_day": last.isoformat() if last else None,
+                    "streak": streak(origin, bits, last) if last else 0,
+                },
+                "$unset": {"taken_dates": ""},
+            },
+        )
+        migrated += 1
+    return migrated
+
+
+async def _main():
+    from database import connect_db, close_db, get_db
+
+    await connect_db()
+    try:
+        count = await migrate(get_db())
+        reset = await reset_broken_streaks(get_db())
+        print(f"✅ Migrated {count} medication(s) to adherence bitmaps, reset {reset} broken streak(s)")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,301 @@
+"""
+Dose Events — per-dose adherence log and its daily rollup.
+Every take/skip (and every dose still unrecorded at the end of its day,
+via the nightly job) is appended to the dose_events time-series collection:
+  {ts, meta: {user_id, med_id}, scheduled_time, taken_at, status, on_time}
+and folded into adherence_daily, one document per (user_id, day) with
+taken/skipped/missed/on_time counters plus the latest status of each
+dose ("<med_id>@HH:MM"), so re-taking a skipped dose moves the count
+instead of adding one. Analytics and the dashboard read only the rollup.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError
+from database import get_db
+from services.response_cache import invalidate
+
+COLLECTION = "dose_events"
+DAILY_COLLECTION = "adherence_daily"
+STATUSES = ("taken", "skipped", "missed")
+# A dose taken within this many minutes of its scheduled time counts as on time
+ON_TIME_MINUTES = 60
+PERIOD_UNITS = {"daily": "day", "weekly": "week", "monthly": "month"}
+PERIOD_DAYS = {"daily": 1, "weekly": 7, "monthly": 31}
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+async def ensure_collections():
+    """Create the time-series collection and the rollup index (idempotent)."""
+    db = get_db()
+    try:
+        await db.create_collection(
+            COLLECTION,
+            timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"},
+        )
+    except CollectionInvalid:
+        pass  # already exists
+    await db[COLLECTION].create_index([("meta.user_id", 1), ("meta.med_id", 1), ("ts", -1)])
+    await db[DAILY_COLLECTION].create_index([("user_id", 1), ("day", -1)], unique=True)
+
+
+def parse_time(time_str: str) -> tuple[int, int] | None:
+    """(hour, minute) of an "HH:MM" schedule entry, or None if it is malformed."""
+    try:
+        hour, minute = (int(part) for part in time_str.strip().split(":")[:2])
+    except (ValueError, AttributeError):
+        return None
+    return (hour, minute) if 0 <= hour < 24 and 0 <= minute < 60 else None
+
+
+def nearest_dose(time_schedule: list[str], now: datetime) -> str | None:
+    """The valid scheduled "HH:MM" closest to `now` (local time)."""
+    def distance(time_str: str) -> int:
+        hour, minute = parse_time(time_str)
+        return abs(hour * 60 + minute - (now.hour * 60 + now.minute))
+
+    valid = [t for t in time_schedule if parse_time(t)]
+    return min(valid, key=distance).strip() if valid else None
+
+
+def _scheduled_utc(day: date, time_str: str) -> datetime:
+    """Local day + "HH:MM" as a naive UTC datetime (how the app stores timestamps)."""
+    parsed = parse_time(time_str)
+    if parsed is None:
+        raise ValueError(f"Invalid dose time '{time_str}'")
+    hour, minute = parsed
+    local = datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def record_dose(
+    user_id: str,
+    med_id: str,
+    scheduled_time: str,
+    status: str,
+    day: date | None = None,
+    only_if_unrecorded: bool = False,
+) -> bool:
+    """
+    Log one dose outcome and update the day's rollup. Returns False when
+    only_if_unrecorded is set and the dose already has an outcome.
+    """
+    db = get_db()
+    day = day or date.today()
+    day_str = day.isoformat()
+    dose_key = f"{med_id}@{scheduled_time}"
+    scheduled = _scheduled_utc(day, scheduled_time)
+    now = datetime.utcnow()
+    taken_at = now if status == "taken" else None
+    on_time = taken_at is not None and abs(taken_at - scheduled) <= timedelta(minutes=ON_TIME_MINUTES)
+
+    # Compare-and-swap on the dose's previous status so counters stay exact
+    rollup = db[DAILY_COLLECTION]
+    for _ in range(5):
+        current = await rollup.find_one(
+            {"user_id": user_id, "day": day_str},
+            {f"doses.{dose_key}": 1},
+        )
+        previous = (current or {}).get("doses", {}).get(dose_key)
+        if previous is not None and only_if_unrecorded:
+            return False
+        if previous == {"status": status, "on_time": on_time}:
+            break
+
+        inc = {status: 1, "on_time": int(on_time)}
+        if previous:
+            inc[previous["status"]] = inc.get(previous["status"], 0) - 1
+            inc["on_time"] -= int(previous.get("on_time", False))
+        try:
+            result = await rollup.update_one(
+                {"user_id": user_id, "day": day_str, f"doses.{dose_key}": previous},
+                {"$inc": inc, "$set": {f"doses.{dose_key}": {"status": status, "on_time": on_time}}},
+                upsert=current is None,
+            )
+        except DuplicateKeyError:
+            continue  # another write created the day's document first
+        if result.matched_count or result.upserted_id:
+            break
+
+    await db[COLLECTION].insert_one({
+        "ts": scheduled if status == "missed" else now,
+        "meta": {"user_id": user_id, "med_id": med_id},
+        "scheduled_time": scheduled,
+        "taken_at": taken_at,
+        "status": status,
+        "on_time": on_time,
+    })
+    return True
+
+
+def _is_scheduled(med: dict, day: date) -> bool:
+    """Whether the medication has doses on `day` (date range and frequency)."""
+    day_str = day.isoformat()
+    if med.get("start_date") and med["start_date"] > day_str:
+        return False
+    if med.get("end_date") and med["end_date"] < day_str:
+        return False
+    frequency = med.get("frequency", "daily")
+    if frequency == "as_needed":
+        return False
+    if frequency == "specific_days" and med.get("specific_days"):
+        # Same matching as the reminder cron jobs: first three letters of the day name
+        return WEEKDAYS[day.weekday()] in {d.lower()[:3] for d in med["specific_days"]}
+    return True
+
+
+def _missed_event(user_id: str, med_id: str, scheduled: datetime) -> dict:
+    return {
+        "ts": scheduled,
+        "meta": {"user_id": user_id, "med_id": med_id},
+        "scheduled_time": scheduled,
+        "taken_at": None,
+        "status": "missed",
+        "on_time": False,
+    }
+
+
+async def record_missed_doses(day: date | None = None) -> int:
+    """
+    Log every dose scheduled on `day` (default: yesterday) that has no outcome
+    as missed (nightly job). One conditional rollup update per user, one
+    bulk_write and one insert_many for the whole day; affected users'
+    cached responses are invalidated.
+    """
+    db = get_db()
+    day = day or date.today() - timedelta(days=1)
+    day_str = day.isoformat()
+
+    # Doses per user; a medication created after a dose's time can't have missed it
+    due: dict[str, list[tuple[str, str, datetime]]] = {}
+    cursor = db.medications.find(
+        # $not also keeps medications stored before created_at existed
+        {"frequency": {"$ne": "as_needed"},
+         "created_at": {"$not": {"$gte": _scheduled_utc(day + timedelta(days=1), "00:00")}}},
+        {"user_id": 1, "time_schedule": 1, "frequency": 1, "specific_days": 1,
+         "start_date": 1, "end_date": 1, "created_at": 1},
+    )
+    async for med in cursor:
+        if not _is_scheduled(med, day):
+            continue
+        for time_str in med.get("time_schedule", []):
+            if not parse_time(time_str):
+                print(f"⚠️  Skipping invalid dose time '{time_str}' of medication {med['_id']}")
+                continue
+            time_str = time_str.strip()
+            scheduled = _scheduled_utc(day, time_str)
+            if med.get("created_at") and med["created_at"] > scheduled:
+                continue
+            due.setdefault(med["user_id"], []).append((str(med["_id"]), time_str, scheduled))
+    if not due:
+        return 0
+
+    rollup = db[DAILY_COLLECTION]
+    recorded = {
+        doc["user_id"]: doc.get("doses", {})
+        async for doc in rollup.find({"user_id": {"$in": list(due)}, "day": day_str}, {"user_id": 1, "doses": 1})
+    }
+    ops, events, missed = [], [], 0
+    for user_id, doses in due.items():
+        missing = [(med_id, t, scheduled) for med_id, t, scheduled in doses
+                   if f"{med_id}@{t}" not in recorded.get(user_id, {})]
+        due[user_id] = missing
+        if not missing:
+            continue
+        keys = [f"doses.{med_id}@{t}" for med_id, t, _ in missing]
+        # Applies only if none of the doses got an outcome since the read above
+        ops.append(UpdateOne(
+            {"user_id": user_id, "day": day_str, **{key: {"$exists": False} for key in keys}},
+            {"$inc": {"missed": len(missing)}, "$set": {key: {"status": "missed", "on_time": False} for key in keys}},
+            upsert=user_id not in recorded,
+        ))
+        events += [_missed_event(user_id, med_id, scheduled) for med_id, _, scheduled in missing]
+    if not ops:
+        return 0
+
+    try:
+        result = await rollup.bulk_write(ops, ordered=False)
+        applied = result.matched_count + len(result.upserted_ids)
+    except BulkWriteError:
+        applied = -1  # e.g. a concurrent write created a user's day document
+    if applied != len(ops):
+        # Some users' updates didn't apply: only the nightly job writes "missed", so a
+        # missed status means our update landed; doses still unrecorded go through the
+        # per-dose compare-and-swap path, which skips any recorded in the meantime
+        current = {
+            doc["user_id"]: doc.get("doses", {})
+            async for doc in rollup.find({"user_id": {"$in": list(due)}, "day": day_str}, {"user_id": 1, "doses": 1})
+        }
+        events = []
+        for user_id, doses in due.items():
+            for med_id, time_str, scheduled in doses:
+                outcome = current.get(user_id, {}).get(f"{med_id}@{time_str}")
+                if outcome is None:
+                    if await record_dose(user_id, med_id, time_str, "missed", day=day, only_if_unrecorded=True):
+                        missed += 1
+                elif outcome["status"] == "missed":
+                    events.append(_missed_event(user_id, med_id, scheduled))
+    if events:
+        await db[COLLECTION].insert_many(events, ordered=False)
+    missed += len(events)
+
+    for user_id, doses in due.items():
+        if doses:
+            await invalidate(user_id, "medications")
+    return missed
+
+
+def _rates(doc: dict) -> dict:
+    recorded = doc["taken"] + doc["skipped"] + doc["missed"]
+    return {
+        "doses": recorded,
+        "taken": doc["taken"],
+        "skipped": doc["skipped"],
+        "missed": doc["missed"],
+        "on_time": doc["on_time"],
+        "rate": round(doc["taken"] / recorded * 100, 1) if recorded else 0.0,
+        "on_time_rate": round(doc["on_time"] / doc["taken"] * 100, 1) if doc["taken"] else 0.0,
+    }
+
+
+async def adherence_buckets(user_id: str, period: str, limit: int) -> list[dict]:
+    """Daily/weekly/monthly dose adherence for the last `limit` periods, oldest first."""
+    since = (date.today() - timedelta(days=PERIOD_DAYS[period] * limit)).isoformat()
+    if period == "daily":
+        bucket = "$day"
+    else:
+        bucket = {"$dateToString": {"format": "%Y-%m-%d", "date": {"$dateTrunc": {
+            "date": {"$dateFromString": {"dateString": "$day"}},
+            "unit": PERIOD_UNITS[period],
+            "startOfWeek": "monday",
+        }}}}
+    pipeline = [
+        # Range scan on the (user_id, day) index
+        {"$match": {"user_id": user_id, "day": {"$gte": since}}},
+        {"$group": {
+            "_id": bucket,
+            **{field: {"$sum": {"$ifNull": [f"${field}", 0]}} for field in (*STATUSES, "on_time")},
+        }},
+        {"$sort": {"_id": -1}},
+        {"$limit": limit},
+    ]
+    results = [
+        {"period_start": doc["_id"], **_rates(doc)}
+        async for doc in get_db()[DAILY_COLLECTION].aggregate(pipeline)
+    ]
+    results.reverse()
+    return results
+
+
+async def adherence_summary(user_id: str, days: int = 30) -> dict:
+    """Dose adherence over the last `days` days, summed from the daily rollup."""
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+    totals = {field: 0 for field in (*STATUSES, "on_time")}
+    cursor = get_db()[DAILY_COLLECTION].find(
+        {"user_id": user_id, "day": {"$gte": since}},
+        {field: 1 for field in totals},
+    )
+    async for doc in cursor:
+        for field in totals:
+            totals[field] += doc.get(field, 0)
+    return {**_rates(totals), "window_days": days}
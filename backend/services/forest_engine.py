@@ -0,0 +1,240 @@
+"""
+Forest Engine — evaluates a trained RandomForestClassifier from flat NumPy arrays.
+All trees are compiled once into contiguous node arrays (feature, threshold,
+left/right child, leaf probabilities) and traversed level-by-level for every
+(tree, row) pair at once, avoiding sklearn's per-call joblib dispatch.
+Results match sklearn's predict_proba exactly.
+
+The arrays can also be exported as plain .npy files plus a JSON manifest
+and loaded back memory-mapped — no pickle, near-instant startup, and the
+pages are shared between worker processes.
+"""
+
+import io
+import os
+import json
+import hashlib
+from datetime import datetime
+import numpy as np
+
+# Arrays written by FlatForest.save(), one <name>.npy file each
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "leaf_value", "roots", "classes")
+MANIFEST_NAME = "manifest.json"
+ARTIFACT_FORMAT = 1
+
+
+class FlatForest:
+    """Array-compiled forest with a sklearn-compatible predict_proba()."""
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        leaf_value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        classes: np.ndarray,
+        n_features: int | None = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_estimators = len(roots)
+        self.n_features_in_ = n_features if n_features is not None else (int(feature.max()) + 1 if len(feature) else 0)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        """Compile a fitted RandomForestClassifier into flat node arrays."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so extra traversal steps are no-ops
+            left = np.where(is_leaf, node_ids, tree.children_left).astype(np.int32) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right).astype(np.int32) + offset
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+
+            # Same normalisation sklearn applies in DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+
+            features.append(feature)
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features)),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds)),
+            left=np.ascontiguousarray(np.concatenate(lefts)),
+            right=np.ascontiguousarray(np.concatenate(rights)),
+            leaf_value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+            n_features=model.n_features_in_,
+        )
+
+    def split_thresholds(self, feature_index: int) -> np.ndarray:
+        """All thresholds the forest compares feature_index against (internal nodes only)."""
+        is_internal = self.left != np.arange(len(self.left), dtype=self.left.dtype)
+        return np.asarray(self.threshold[is_internal & (self.feature == feature_index)])
+
+    def checksum(self) -> str:
+        """The manifest checksum save() would write, computed in memory."""
+        checksums = {}
+        for name in ARRAY_NAMES:
+            buffer = io.BytesIO()
+            np.save(buffer, np.ascontiguousarray(getattr(self, "classes_" if name == "classes" else name)),
+                    allow_pickle=False)
+            checksums[name] = hashlib.sha256(buffer.getvalue()).hexdigest()
+        return hashlib.sha256("".join(checksums[n] for n in ARRAY_NAMES).encode()).hexdigest()
+
+    def save(
+        self,
+        directory: str,
+        feature_names: list[str],
+        model_version: str | None = None,
+        metadata: dict | None = None,
+    ) -> dict:
+        """Write every array as an uncompressed .npy file plus manifest.json."""
+        os.makedirs(directory, exist_ok=True)
+        checksums = {}
+        for name in ARRAY_NAMES:
+            array = np.ascontiguousarray(getattr(self, "classes_" if name == "classes" else name))
+            path = os.path.join(directory, f"{name}.npy")
+            np.save(path, array, allow_pickle=False)
+            checksums[name] = _sha256(path)
+
+        # Overall checksum covers every array file in a fixed order
+        digest = hashlib.sha256("".join(checksums[n] for n in ARRAY_NAMES).encode()).hexdigest()
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "model_version": model_version or digest[:12],
+            "feature_names": feature_names,
+            "n_features": self.n_features_in_,
+            "n_estimators": self.n_estimators,
+            "n_nodes": int(len(self.feature)),
+            "max_depth": self.max_depth,
+            "checksum": digest,
+            "array_checksums": checksums,
+            "created_at": datetime.utcnow().isoformat(),
+            **(metadata or {}),
+        }
+        with open(os.path.join(directory, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, verify: bool = False) -> tuple["FlatForest", dict]:
+        """
+        Load an exported forest. With mmap=True arrays are mapped read-only
+        instead of read into memory. verify=True re-hashes every file
+        against the manifest (reads all pages, so it is off by default).
+        """
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported model artifact format: {manifest.get('format')}")
+
+        arrays = {}
+        for name in ARRAY_NAMES:
+            path = os.path.join(directory, f"{name}.npy")
+            if verify and _sha256(path) != manifest["array_checksums"][name]:
+                raise ValueError(f"Checksum mismatch for {path}")
+            array = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+            # Plain ndarray view over the mapping avoids memmap subclass overhead when indexing
+            arrays[name] = np.asarray(array)
+
+        forest = cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            leaf_value=arrays["leaf_value"],
+            roots=arrays["roots"],
+            max_depth=manifest["max_depth"],
+            classes=arrays["classes"],
+            n_features=manifest["n_features"],
+        )
+        return forest, manifest
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Return the global leaf index reached by every (tree, row) pair."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        rows = np.broadcast_to(np.arange(n_rows), (self.n_estimators, n_rows))
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Average per-tree leaf probabilities, shape (n_rows, n_classes)."""
+        leaves = self.apply(np.atleast_2d(X))
+        per_tree = self.leaf_value[leaves]  # (n_trees, n_rows, n_classes)
+
+        # Sequential reduction over trees mirrors sklearn's accumulation order
+        proba = np.add.reduce(per_tree, axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def contributions(self, X, class_index: int = 1) -> tuple[float, np.ndarray]:
+        """
+        Path-based feature attributions (Saabas / TreeSHAP-style decomposition).
+        Walking each row down each tree, the change in the node's class
+        probability at every split is credited to the split feature, so
+        bias + contributions.sum(axis=1) equals the predicted probability.
+        Returns (bias, contributions) with contributions shaped (n_rows, n_features).
+        """
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        n_rows = X.shape[0]
+        rows = np.broadcast_to(np.arange(n_rows), (self.n_estimators, n_rows))
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        # leaf_value holds the class distribution of every node, not only leaves
+        node_value = self.leaf_value[:, class_index]
+
+        contrib = np.zeros((n_rows, self.n_features_in_), dtype=np.float64)
+        for _ in range(self.max_depth):
+            feature = self.feature[nodes]
+            go_left = X[rows, feature] <= self.threshold[nodes]
+            children = np.where(go_left, self.left[nodes], self.right[nodes])
+            # Leaves loop onto themselves, so their delta is zero
+            np.add.at(contrib, (rows, feature), node_value[children] - node_value[nodes])
+            nodes = children
+
+        contrib /= self.n_estimators
+        bias = float(node_value[self.roots].mean())
+        return bias, contrib
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
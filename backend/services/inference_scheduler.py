@@ -0,0 +1,145 @@
+"""
+Inference Scheduler — runs risk predictions off the event loop in micro-batches.
+Requests are queued, grouped until max_batch_size is reached or max_wait_us
+has passed since the first one arrived, and scored with one predict_batch()
+call in a dedicated thread pool. Each caller awaits its own future.
+"""
+
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from config import get_settings
+from models.prediction import PredictionInput, PredictionOutput
+from services.ml_service import predict_batch
+
+
+class InferenceScheduler:
+    """Dynamic micro-batcher between async routes and the CPU-bound model."""
+
+    def __init__(self, max_batch_size: int = 64, max_wait_us: int = 2000, workers: int = 1):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1_000_000
+        self.workers = workers
+        self._queue: asyncio.Queue | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._task: asyncio.Task | None = None
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the batching loop (called from the FastAPI lifespan)."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._task = asyncio.create_task(self._run())
+        print(f"🧠 Inference scheduler started (batch ≤{self.max_batch_size}, "
+              f"wait ≤{int(self.max_wait * 1_000_000)}µs, {self.workers} worker(s))")
+
+    async def stop(self):
+        """Stop batching, fail anything still queued and release the pool."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue and not self._queue.empty():
+            *_, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference scheduler is shutting down."))
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def submit(self, data: PredictionInput, explain: bool = False) -> PredictionOutput:
+        """Queue one prediction (optionally with risk drivers) and wait for its result."""
+        if not self.running:
+            # Scheduler not started (e.g. scripts) — still keep the loop free
+            return (await asyncio.to_thread(predict_batch, [data], explain))[0]
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((data, explain, future))
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    async def _collect(self) -> list:
+        """Block for the first request, then gather more until full or the wait expires."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free worker first so requests keep accumulating meanwhile
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+
+            # Drop requests whose callers went away (e.g. client disconnected)
+            batch = [item for item in batch if not item[-1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            # One model pass per batch; attributions are computed if any caller asked
+            explain = any(wants for _, wants, _ in batch)
+            job = loop.run_in_executor(
+                self._executor, partial(predict_batch, [data for data, _, _ in batch], explain=explain),
+            )
+            job.add_done_callback(lambda job, batch=batch: self._resolve(job, batch))
+
+    def _resolve(self, job: asyncio.Future, batch: list):
+        """Hand each caller its own result (or the batch's exception)."""
+        self._slots.release()
+        error = job.exception()
+        results = None if error else job.result()
+        for i, (*_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+
+_settings = get_settings()
+inference_scheduler = InferenceScheduler(
+    max_batch_size=_settings.INFERENCE_MAX_BATCH_SIZE,
+    max_wait_us=_settings.INFERENCE_MAX_WAIT_US,
+    workers=_settings.INFERENCE_WORKERS,
+)
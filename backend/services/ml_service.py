@@ -7,29 +7,375 @@ The model expects 15 features in this exact order:
 """
 
 import os
+import json
+import threading
+from collections import OrderedDict
 import joblib
 import numpy as np
-from models.prediction import PredictionInput, PredictionOutput
+from config import get_settings
+from models.prediction import PredictionInput, PredictionOutput, RiskDriver
+from services.forest_engine import FlatForest, MANIFEST_NAME
+from services.model_registry import active_version, version_dir
 
 # Path to the trained model file (generated by model/train.py)
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "model", "heart_disease_model.pkl")
 
-_model = None
+# Pickle-free array export of the same model (generated by ml/export_model.py)
+MODEL_ARTIFACT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "model", "heart_disease_model")
 
+# Distilled compact variant (generated by train_model.py --distill)
+COMPACT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "model", "heart_disease_model_compact.pkl")
+COMPACT_ARTIFACT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "model", "heart_disease_model_compact")
 
-def load_model():
-    """Load the model into memory (called once at startup)."""
-    global _model
-    if os.path.exists(MODEL_PATH):
-        _model = joblib.load(MODEL_PATH)
-        print(f"✅ ML model loaded from {MODEL_PATH}")
+# "compact" is served by default; "full" is the high-accuracy 100-tree forest
+MODEL_VARIANTS = ("compact", "full")
+
+# Precomputed risk grid of the pickled model (generated by ml/build_risk_grid.py);
+# array exports and registry versions keep theirs next to their arrays
+GRID_PATH = os.path.join(os.path.dirname(__file__), "..", "ml", "risk_grid.npy")
+GRID_MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "..", "ml", "risk_grid.json")
+
+# "auto" picks "mmap" when the array export exists, else "sklearn"
+ENGINES = ("auto", "sklearn", "flat", "mmap")
+
+# Training column names, in model input order
+FEATURE_NAMES = [
+    "HighBP", "HighChol", "CholCheck", "BMI", "Smoker", "Stroke", "Diabetes",
+    "PhysActivity", "Fruits", "Veggies", "HvyAlcoholConsump", "GenHlth",
+    "DiffWalk", "Sex", "Age",
+]
+
+# PredictionInput fields in the same order, with labels for risk drivers
+FEATURE_LABELS = {
+    "high_bp": "High blood pressure",
+    "high_cholesterol": "High cholesterol",
+    "cholesterol_check": "Cholesterol check in last 5 years",
+    "bmi": "BMI",
+    "smoker": "Smoking history",
+    "stroke": "History of stroke",
+    "diabetes": "Diabetes",
+    "physical_activity": "Physical activity",
+    "fruits": "Daily fruit",
+    "veggies": "Daily vegetables",
+    "heavy_alcohol": "Heavy alcohol use",
+    "general_health": "General health",
+    "difficulty_walking": "Difficulty walking",
+    "sex": "Sex",
+    "age": "Age group",
+}
+FIELD_NAMES = list(FEATURE_LABELS)
+
+# Number of risk drivers returned per prediction
+TOP_RISK_DRIVERS = 5
+
+# Column of BMI in the feature vector — the only continuous feature
+BMI_INDEX = 3
+
+# Max distinct feature vectors kept in the prediction cache
+PREDICTION_CACHE_SIZE = 50_000
+
+
+class PredictionCache:
+    """Thread-safe bounded LRU of feature key -> class-1 probability."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> float | None:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: float):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Allowed values per feature on the risk grid (BMI is binned separately)
+_BINARY = (0, 1)
+GRID_LEVELS = [
+    _BINARY,          # HighBP
+    _BINARY,          # HighChol
+    _BINARY,          # CholCheck
+    None,             # BMI
+    _BINARY,          # Smoker
+    _BINARY,          # Stroke
+    (0, 1, 2),        # Diabetes
+    _BINARY,          # PhysActivity
+    _BINARY,          # Fruits
+    _BINARY,          # Veggies
+    _BINARY,          # HvyAlcoholConsump
+    (1, 2, 3, 4, 5),  # GenHlth
+    _BINARY,          # DiffWalk
+    _BINARY,          # Sex
+    tuple(range(1, 14)),  # Age
+]
+# BMI span covered by the grid (matches PredictionInput validation)
+GRID_BMI_RANGE = (10.0, 80.0)
+
+
+
+class ModelState:
+    """
+    Everything derived from one loaded model version. Predictions grab the
+    active state once, so a hot reload swapping in a new state never
+    affects requests already in flight.
+    """
+
+    def __init__(self, predictor, version: str, engine: str, source: str, checksum: str | None = None):
+        self.predictor = predictor
+        self.version = version
+        self.engine = engine
+        self.source = source
+        # Array checksum of the forest (manifest checksum for exports, computed lazily otherwise)
+        self.checksum = checksum
+        # Sorted unique BMI split thresholds across all trees (see _cache_key)
+        self.bmi_thresholds = collect_bmi_thresholds(predictor)
+        self.cache = PredictionCache(PREDICTION_CACHE_SIZE)
+        self.grid = None
+        self.grid_bmi_edges = np.empty(0)
+        # Risk drivers per cache key; attributions are exact per BMI bin too
+        self.explain_cache = PredictionCache(PREDICTION_CACHE_SIZE)
+        self._explainer = predictor if isinstance(predictor, FlatForest) else None
+        self._explainer_lock = threading.Lock()
+
+    def explainer(self) -> FlatForest:
+        """FlatForest used for attributions; compiled on first use for the sklearn engine."""
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    self._explainer = FlatForest.from_sklearn(self.predictor)
+        return self._explainer
+
+
+_state: ModelState | None = None
+
+
+def collect_bmi_thresholds(model) -> np.ndarray:
+    """Every threshold the forest ever compares BMI against, sorted."""
+    if isinstance(model, FlatForest):
+        return np.unique(model.split_thresholds(BMI_INDEX))
+    thresholds = [
+        estimator.tree_.threshold[estimator.tree_.feature == BMI_INDEX]
+        for estimator in model.estimators_
+    ]
+    return np.unique(np.concatenate(thresholds)) if thresholds else np.empty(0)
+
+
+def grid_bmi_edges(bmi_thresholds: np.ndarray) -> np.ndarray:
+    """BMI split points that fall inside GRID_BMI_RANGE; they delimit the grid's BMI bins."""
+    low, high = GRID_BMI_RANGE
+    return bmi_thresholds[(bmi_thresholds >= low) & (bmi_thresholds < high)]
+
+
+def model_checksum(state: ModelState) -> str:
+    """The state's forest checksum; pickled models are compiled (and kept as the explainer) once."""
+    if state.checksum is None:
+        state.checksum = state.explainer().checksum()
+    return state.checksum
+
+
+def grid_paths(state: ModelState) -> tuple[str, str]:
+    """(grid .npy, grid manifest) belonging to the state's model."""
+    if state.engine == "mmap":
+        return (
+            os.path.join(state.source, os.path.basename(GRID_PATH)),
+            os.path.join(state.source, os.path.basename(GRID_MANIFEST_PATH)),
+        )
+    return GRID_PATH, GRID_MANIFEST_PATH
+
+
+def _load_grid(state: ModelState):
+    """
+    Memory-map the precomputed risk grid if it exists and was built from
+    exactly the state's model (same checksum and version). Pages are
+    shared between worker processes through the OS page cache.
+    """
+    grid_path, manifest_path = grid_paths(state)
+    if not (os.path.exists(grid_path) and os.path.exists(manifest_path)):
+        return
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    # BMI split edges alone don't identify a model: retrained forests share the x.5 BMI splits
+    edges = np.asarray(manifest["bmi_edges"], dtype=np.float64)
+    if (
+        manifest.get("model_checksum") != model_checksum(state)
+        or manifest.get("model_version") != state.version
+        or not np.array_equal(edges, grid_bmi_edges(state.bmi_thresholds))
+    ):
+        print(f"⚠️  Risk grid at {grid_path} was built from a different model — ignoring it. "
+              "Re-run ml/build_risk_grid.py.")
+        return
+
+    state.grid = np.load(grid_path, mmap_mode="r")
+    state.grid_bmi_edges = edges
+    print(f"✅ Risk grid memory-mapped from {grid_path} ({state.grid.size:,} cells)")
+
+
+def _grid_index(state: ModelState, features: list) -> tuple | None:
+    """Grid cell for a feature vector, or None if any value is off the grid."""
+    index = []
+    for i, value in enumerate(features):
+        if i == BMI_INDEX:
+            low, high = GRID_BMI_RANGE
+            if not low <= value <= high:
+                return None
+            index.append(int(np.searchsorted(state.grid_bmi_edges, np.float32(value), side="left")))
+            continue
+        levels = GRID_LEVELS[i]
+        if value != int(value) or not levels[0] <= value <= levels[-1]:
+            return None
+        index.append(int(value) - levels[0])
+    return tuple(index)
+
+
+def variant_paths(variant: str) -> tuple[str, str]:
+    """(.pkl path, array export dir) of a model variant."""
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{variant}'. Expected one of {MODEL_VARIANTS}.")
+    if variant == "compact":
+        return COMPACT_MODEL_PATH, COMPACT_ARTIFACT_DIR
+    return MODEL_PATH, MODEL_ARTIFACT_DIR
+
+
+def resolve_variant(variant: str | None) -> str:
+    """Requested variant, falling back to the full model when no compact one was published."""
+    variant = variant or get_settings().ML_MODEL_VARIANT
+    model_path, artifact_dir = variant_paths(variant)
+    if variant == "compact" and not (
+        os.path.exists(model_path) or os.path.exists(os.path.join(artifact_dir, MANIFEST_NAME))
+    ):
+        print("ℹ️  No compact model published — serving the full model.")
+        return "full"
+    return variant
+
+
+def _resolve_engine(engine: str | None, artifact_dir: str) -> str:
+    engine = engine or get_settings().ML_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ML engine '{engine}'. Expected one of {ENGINES}.")
+    if engine == "auto":
+        engine = "mmap" if os.path.exists(os.path.join(artifact_dir, MANIFEST_NAME)) else "sklearn"
+    return engine
+
+
+def build_state(
+    engine: str | None = None,
+    artifact_dir: str | None = None,
+    variant: str | None = None,
+    load_grid: bool = True,
+) -> ModelState | None:
+    """
+    Load a model into a new ModelState without activating it.
+    artifact_dir points at an exported array directory (e.g. a registry
+    version) and always loads memory-mapped. Otherwise the variant
+    (settings.ML_MODEL_VARIANT by default) picks the .pkl / export, and
+    engine="flat" compiles the pickled forest into FlatForest arrays while
+    engine="mmap" maps its array export; defaults to settings.ML_ENGINE.
+    """
+    model_path = None
+    if artifact_dir is None:
+        model_path, variant_dir = variant_paths(resolve_variant(variant))
+        engine = _resolve_engine(engine, variant_dir)
+        if engine == "mmap":
+            artifact_dir = variant_dir
+    else:
+        engine = "mmap"
+
+    if engine == "mmap":
+        if not os.path.exists(os.path.join(artifact_dir, MANIFEST_NAME)):
+            print(f"⚠️  Model artifact not found at {artifact_dir}. Run ml/export_model.py first.")
+            return None
+        predictor, manifest = FlatForest.load(
+            artifact_dir, mmap=True, verify=get_settings().ML_VERIFY_CHECKSUM,
+        )
+        state = ModelState(predictor, manifest["model_version"], engine, artifact_dir, manifest["checksum"])
+    elif os.path.exists(model_path):
+        model = joblib.load(model_path)
+        predictor = FlatForest.from_sklearn(model) if engine == "flat" else model
+        version = f"{os.path.splitext(os.path.basename(model_path))[0]}-{int(os.path.getmtime(model_path))}"
+        state = ModelState(predictor, version, engine, model_path)
     else:
-        print(f"⚠️  Model file not found at {MODEL_PATH}. Run train_model.py first.")
+        print(f"⚠️  Model file not found at {model_path}. Run train_model.py first.")
+        return None
+
+    if load_grid:
+        _load_grid(state)
+    return state
+
+
+def warm_up(state: ModelState):
+    """Run a few predictions so first real requests don't pay page faults / lazy init."""
+    probe = np.array([
+        [1, 1, 1, 30.0, 1, 0, 2, 0, 1, 1, 0, 5, 1, 0, 9],
+        [0, 0, 1, 22.0, 0, 0, 0, 1, 1, 1, 0, 1, 0, 1, 3],
+    ], dtype=np.float64)
+    state.predictor.predict_proba(probe)
+    state.predictor.predict_proba(probe[:1])
+
+
+def activate_state(state: ModelState):
+    """Atomically make state the one used by new predictions."""
+    global _state
+    _state = state
+    print(f"✅ ML model {state.version} active from {state.source} (engine: {state.engine})")
+
+
+def load_model(engine: str | None = None, variant: str | None = None):
+    """
+    Load the model into memory (called once at startup).
+    With engine "auto" or "mmap", the registry's active version wins over
+    the standalone .pkl / array export.
+    """
+    engine = engine or get_settings().ML_ENGINE
+    version = active_version() if engine in ("auto", "mmap") and variant is None else None
+    state = build_state(artifact_dir=version_dir(version)) if version else build_state(engine, variant=variant)
+    if state is not None:
+        activate_state(state)
+
+
+def get_state() -> ModelState | None:
+    """Return the active model state."""
+    return _state
 
 
 def get_model():
-    """Return the loaded model instance."""
-    return _model
+    """Return the active predictor — a FlatForest or the sklearn model."""
+    return _state.predictor if _state is not None else None
+
+
+def get_model_version() -> str | None:
+    return _state.version if _state is not None else None
 
 
 def prepare_features(data: PredictionInput) -> list:
@@ -53,6 +399,25 @@ def prepare_features(data: PredictionInput) -> list:
     ]
 
 
+def _cache_key(state: ModelState, features: list) -> tuple:
+    """
+    Normalized feature tuple for the prediction cache.
+    BMI is replaced by the index of the threshold interval it falls in:
+    every tree compares float32(BMI) <= t, so all BMIs between two adjacent
+    split points take identical paths and get identical probabilities.
+    """
+    bmi_bin = int(np.searchsorted(state.bmi_thresholds, np.float32(features[BMI_INDEX]), side="left"))
+    key = [float(v) for v in features]
+    key[BMI_INDEX] = bmi_bin
+    return tuple(key)
+
+
+def prediction_cache_info() -> dict:
+    """Hit/miss counters and occupancy of the active model's prediction cache."""
+    return _state.cache.info() if _state is not None else {}
+
+
+LOW_RISK_THRESHOLD = 0.15
 PREDICTION_THRESHOLD = 0.25  # Lower than 0.5 to improve recall for disease cases
 
 
@@ -62,7 +427,7 @@ def classify_risk(probability: float) -> str:
     Thresholds tuned to the class-balanced RandomForest model
     (probabilities tend to be lower than a vanilla model).
     """
-    if probability < 0.15:
+    if probability < LOW_RISK_THRESHOLD:  # 0.15
         return "Low"
     elif probability < PREDICTION_THRESHOLD:  # 0.25
         return "Medium"
@@ -70,20 +435,9 @@ def classify_risk(probability: float) -> str:
         return "High"
 
 
-def predict(data: PredictionInput) -> PredictionOutput:
-    """Run prediction and return structured output."""
-    model = get_model()
-    if model is None:
-        raise RuntimeError("ML model is not loaded. Please train and place the .pkl file.")
-
-    features = prepare_features(data)
-    feature_array = np.array([features])
-
-    # predict_proba returns [[prob_class_0, prob_class_1]]
-    probabilities = model.predict_proba(feature_array)
-    prob_disease = float(probabilities[0][1])
-    prob_no_disease = float(probabilities[0][0])
-
+def _build_output(data: PredictionInput, prob_disease: float, model_version: str | None = None) -> PredictionOutput:
+    """Wrap a class-1 probability into the structured prediction output."""
+    prob_no_disease = 1.0 - prob_disease
     risk_category = classify_risk(prob_disease)
 
     # Confidence = how certain the model is about its top prediction
@@ -95,4 +449,103 @@ def predict(data: PredictionInput) -> PredictionOutput:
         risk_category=risk_category,
         confidence_score=round(confidence, 4),
         input_summary=data.model_dump(),
+        model_version=model_version,
     )
+
+
+def _require_state() -> ModelState:
+    state = _state
+    if state is None:
+        raise RuntimeError("ML model is not loaded. Please train and place the .pkl file.")
+    return state
+
+
+def _lookup_probability(state: ModelState, features: list) -> tuple[float | None, tuple | None]:
+    """
+    Answer from the precomputed grid or the prediction cache without
+    touching the model. Returns (probability, cache_key); the key is set
+    only on a cache miss so the caller can store the computed value.
+    """
+    # O(1) lookup in the precomputed grid when the input lies on it
+    if state.grid is not None:
+        cell = _grid_index(state, features)
+        if cell is not None:
+            return float(state.grid[cell]), None
+
+    key = _cache_key(state, features)
+    return state.cache.get(key), key
+
+
+def _top_drivers(features: list, contributions: np.ndarray) -> list[dict]:
+    """The TOP_RISK_DRIVERS features with the largest absolute contribution."""
+    drivers = []
+    for i in np.argsort(-np.abs(contributions))[:TOP_RISK_DRIVERS]:
+        if contributions[i] == 0:
+            break
+        name = FIELD_NAMES[i]
+        drivers.append({
+            "feature": name,
+            "label": FEATURE_LABELS[name],
+            "value": float(features[i]),
+            "contribution": round(float(contributions[i]) * 100, 2),
+        })
+    return drivers
+
+
+def _explain_batch(state: ModelState, features: list[list]) -> list[list[dict]]:
+    """Risk drivers for every row; cached rows skip the tree walk, the rest share one pass."""
+    drivers: list[list[dict] | None] = []
+    miss_keys: dict[int, tuple] = {}
+    for i, row_features in enumerate(features):
+        key = _cache_key(state, row_features)
+        cached = state.explain_cache.get(key)
+        drivers.append(cached)
+        if cached is None:
+            miss_keys[i] = key
+
+    if miss_keys:
+        feature_matrix = np.array([features[i] for i in miss_keys], dtype=np.float64)
+        _, contributions = state.explainer().contributions(feature_matrix)
+        for (i, key), row_contrib in zip(miss_keys.items(), contributions):
+            drivers[i] = _top_drivers(features[i], row_contrib)
+            state.explain_cache.put(key, drivers[i])
+    return drivers
+
+
+def predict(data: PredictionInput, explain: bool = False) -> PredictionOutput:
+    """Run prediction and return structured output."""
+    return predict_batch([data], explain=explain)[0]
+
+
+def predict_batch(rows: list[PredictionInput], explain: bool = False) -> list[PredictionOutput]:
+    """
+    Score many inputs with a single predict_proba call.
+    Grid and cache hits are answered directly; the remaining rows are
+    stacked into one (n_misses, 15) feature matrix instead of dispatching per row.
+    explain=True also attaches the top risk drivers to each output.
+    """
+    state = _require_state()
+    if not rows:
+        return []
+
+    features = [prepare_features(row) for row in rows]
+    probabilities: list[float | None] = []
+    miss_keys: dict[int, tuple] = {}
+    for i, row_features in enumerate(features):
+        prob, key = _lookup_probability(state, row_features)
+        probabilities.append(prob)
+        if prob is None:
+            miss_keys[i] = key
+
+    if miss_keys:
+        feature_matrix = np.array([features[i] for i in miss_keys], dtype=np.float64)
+        prob_disease = state.predictor.predict_proba(feature_matrix)[:, 1]
+        for (i, key), p in zip(miss_keys.items(), prob_disease):
+            probabilities[i] = float(p)
+            state.cache.put(key, float(p))
+
+    outputs = [_build_output(row, p, state.version) for row, p in zip(rows, probabilities)]
+    if explain:
+        for output, drivers in zip(outputs, _explain_batch(state, features)):
+            output.risk_drivers = [RiskDriver(**d) for d in drivers]
+    return outputs
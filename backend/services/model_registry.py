@@ -0,0 +1,121 @@
+"""
+Model Registry — versioned model directories on disk plus hot reload.
+Layout:
+  model/registry/registry.json        {"active": "<version>", "versions": {...}}
+  model/registry/<version>/            arrays + manifest.json from FlatForest.save()
+Activating a version loads it in a worker thread, warms it up and swaps it
+in atomically; requests already running finish on the previous version.
+Each worker process polls registry.json, so activating a version once
+rolls it out to every worker without a restart.
+"""
+
+import os
+import json
+import asyncio
+from datetime import datetime
+
+REGISTRY_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "model", "registry")
+REGISTRY_MANIFEST = os.path.join(REGISTRY_DIR, "registry.json")
+
+_reload_lock = asyncio.Lock()
+
+
+def read_registry() -> dict:
+    """Return the registry manifest (empty registry if none exists yet)."""
+    if not os.path.exists(REGISTRY_MANIFEST):
+        return {"active": None, "versions": {}}
+    with open(REGISTRY_MANIFEST) as f:
+        return json.load(f)
+
+
+def _write_registry(registry: dict):
+    """Write registry.json atomically so pollers never see a partial file."""
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    tmp_path = REGISTRY_MANIFEST + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, REGISTRY_MANIFEST)
+
+
+def version_dir(version: str) -> str:
+    return os.path.join(REGISTRY_DIR, version)
+
+
+def active_version() -> str | None:
+    return read_registry().get("active")
+
+
+def register_version(version: str, manifest: dict, activate: bool = False):
+    """Record an exported version (already written to version_dir) in the registry."""
+    registry = read_registry()
+    registry["versions"][version] = {
+        "checksum": manifest.get("checksum"),
+        "n_estimators": manifest.get("n_estimators"),
+        "created_at": manifest.get("created_at"),
+        "registered_at": datetime.utcnow().isoformat(),
+    }
+    if activate:
+        registry["active"] = version
+    _write_registry(registry)
+
+
+def set_active(version: str):
+    registry = read_registry()
+    if version not in registry["versions"]:
+        raise ValueError(f"Unknown model version '{version}'")
+    registry["active"] = version
+    _write_registry(registry)
+
+
+async def reload_model(version: str | None = None) -> str:
+    """
+    Load `version` (default: the registry's active one) in the background,
+    warm it up and swap it in. Returns the version now serving.
+    """
+    from services.ml_service import build_state, warm_up, activate_state, get_model_version
+
+    async with _reload_lock:
+        registry = read_registry()
+        version = version or registry.get("active")
+        if not version:
+            raise ValueError("No model version given and the registry has no active version")
+        if version not in registry["versions"]:
+            raise ValueError(f"Unknown model version '{version}'")
+        if version == get_model_version():
+            return version
+
+        state = await asyncio.to_thread(build_state, artifact_dir=version_dir(version))
+        if state is None:
+            raise RuntimeError(f"Model version '{version}' could not be loaded")
+        await asyncio.to_thread(warm_up, state)
+        activate_state(state)
+
+        # Persist the pointer so the other worker processes follow
+        if registry.get("active") != version:
+            set_active(version)
+        return version
+
+
+async def watch_registry(interval_seconds: int):
+    """
+    Poll registry.json and hot-reload whenever its active version changes.
+    Only registry-backed engines ("auto", "mmap") follow the registry; an
+    explicit ML_ENGINE of "sklearn" or "flat" keeps the configured model.
+    """
+    from config import get_settings
+    from services.ml_service import get_model_version
+
+    engine = get_settings().ML_ENGINE
+    if engine not in ("auto", "mmap"):
+        print(f"ℹ️  ML_ENGINE={engine} — not following the model registry")
+        return
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            version = active_version()
+            if version and version != get_model_version():
+                print(f"🔄 Registry active version changed to {version} — reloading")
+                await reload_model(version)
+        except Exception as e:
+            print(f"⚠️  Model registry reload failed: {e}")
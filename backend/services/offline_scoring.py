@@ -0,0 +1,150 @@
+"""
+Offline scoring CLI — rescore large BRFSS-format CSV / JSONL files without the HTTP API.
+The input is streamed in fixed-size chunks and fanned out to a process pool
+whose workers each load the model once. Results are written in input order,
+and at most `workers * 2` chunks are in flight, so memory stays bounded
+regardless of file size.
+
+Run from backend/:
+  python -m services.offline_scoring cohort.csv scored.csv
+  python -m services.offline_scoring cohort.jsonl scored.jsonl --chunk-size 20000 --workers 8 --id-column patient_id
+"""
+
+import sys
+import csv
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from services.ml_service import FEATURE_NAMES, FIELD_NAMES, classify_risk, get_model, load_model, get_model_version
+
+
+def _init_worker(engine: str | None, variant: str | None):
+    """Load the model once per worker process."""
+    load_model(engine, variant)
+    if get_model() is None:
+        raise RuntimeError("ML model is not loaded in scoring worker")
+
+
+def _score_chunk(X: np.ndarray) -> tuple[np.ndarray, list[str]]:
+    probability = get_model().predict_proba(X)[:, 1]
+    return probability, [classify_risk(float(p)) for p in probability]
+
+
+def _read_chunks(path: str, chunk_size: int):
+    """Yield DataFrames of at most chunk_size rows from a CSV or JSONL file."""
+    if path.endswith((".jsonl", ".ndjson")):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, skipinitialspace=True)
+
+
+def _feature_matrix(chunk: pd.DataFrame) -> np.ndarray:
+    """Model features in training order; accepts BRFSS or PredictionInput column names."""
+    if all(name in chunk.columns for name in FEATURE_NAMES):
+        columns = FEATURE_NAMES
+    elif all(name in chunk.columns for name in FIELD_NAMES):
+        columns = FIELD_NAMES
+    else:
+        missing = [name for name in FEATURE_NAMES if name not in chunk.columns]
+        raise ValueError(f"Input is missing feature columns: {missing}")
+    return chunk[columns].to_numpy(dtype=np.float64)
+
+
+class _Writer:
+    """Appends scored rows to a CSV or JSONL output file."""
+
+    def __init__(self, path: str, id_column: str | None, model_version: str | None):
+        self.jsonl = path.endswith((".jsonl", ".ndjson"))
+        self.id_column = id_column
+        self.model_version = model_version
+        self.file = open(path, "w", newline="")
+        # csv.writer quotes ids containing commas, quotes or newlines
+        self.csv = None if self.jsonl else csv.writer(self.file, lineterminator="\n")
+        if self.csv:
+            header = ([id_column] if id_column else ["row"]) + ["probability", "risk_category", "model_version"]
+            self.csv.writerow(header)
+
+    def write(self, first_row: int, ids, probability: np.ndarray, categories: list[str]):
+        if self.csv:
+            self.csv.writerows(
+                (ids[i] if ids is not None else first_row + i, f"{float(p):.6f}", category, self.model_version or "")
+                for i, (p, category) in enumerate(zip(probability, categories))
+            )
+            return
+        lines = []
+        for i, (p, category) in enumerate(zip(probability, categories)):
+            row_id = ids[i] if ids is not None else first_row + i
+            record = {self.id_column or "row": row_id, "probability": round(float(p), 6),
+                      "risk_category": category, "model_version": self.model_version}
+            lines.append(json.dumps(record, default=str))
+        self.file.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    chunk_size: int = 10_000,
+    workers: int = 4,
+    id_column: str | None = None,
+    engine: str | None = None,
+    variant: str | None = None,
+) -> dict:
+    """Score input_path into output_path; returns row count, seconds and rows/s."""
+    # Parent loads too, only to stamp the model version on the output
+    load_model(engine, variant)
+    writer = _Writer(output_path, id_column, get_model_version())
+
+    start = time.perf_counter()
+    rows_done = 0
+    next_row = 0
+    pending: deque = deque()
+
+    def _drain_one():
+        nonlocal rows_done
+        first_row, ids, future = pending.popleft()
+        probability, categories = future.result()
+        writer.write(first_row, ids, probability, categories)
+        rows_done += len(probability)
+        elapsed = time.perf_counter() - start
+        print(f"   {rows_done:,} rows scored ({rows_done / elapsed:,.0f} rows/s)", end="\r", file=sys.stderr)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(engine, variant)) as pool:
+            for chunk in _read_chunks(input_path, chunk_size):
+                ids = chunk[id_column].tolist() if id_column else None
+                pending.append((next_row, ids, pool.submit(_score_chunk, _feature_matrix(chunk))))
+                next_row += len(chunk)
+                # Backpressure: never hold more than 2 chunks per worker in memory
+                while len(pending) >= workers * 2:
+                    _drain_one()
+            while pending:
+                _drain_one()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {"rows": rows_done, "seconds": round(elapsed, 2), "rows_per_second": round(rows_done / elapsed, 1) if elapsed else 0.0}
+    print(f"\n✅ Scored {rows_done:,} rows in {elapsed:.1f}s ({stats['rows_per_second']:,.0f} rows/s) → {output_path}",
+          file=sys.stderr)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline heart disease risk scoring")
+    parser.add_argument("input", help="BRFSS-format .csv or .jsonl file")
+    parser.add_argument("output", help="output .csv or .jsonl file")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--id-column", default=None, help="input column copied to the output as row id")
+    parser.add_argument("--engine", default=None, help="ML engine (default: ML_ENGINE)")
+    parser.add_argument("--variant", choices=["compact", "full"], default=None)
+    args = parser.parse_args()
+    score_file(args.input, args.output, args.chunk_size, args.workers, args.id_column, args.engine, args.variant)
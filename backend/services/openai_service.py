@@ -4,22 +4,48 @@ using GPT-4o-mini with structured JSON output.
 """
 
 import json
+from typing import AsyncIterator
 from openai import AsyncOpenAI
 from config import get_settings
+from models.prediction import Recommendations
+from services import recommendation_cache
+from services.streaming import parse_json_content
 
 settings = get_settings()
 client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
+# Bump whenever the risk recommendation prompt changes; part of the cache key
+RISK_PROMPT_VERSION = "risk-v1"
+RISK_MODEL = "gpt-4o-mini"
 
-async def generate_workout_plan(
+
+async def _stream_content(
+    messages: list[dict],
+    temperature: float,
+    max_tokens: int,
+    model: str = "gpt-4o-mini",
+) -> AsyncIterator[str]:
+    """Yield the text deltas of a streamed chat completion."""
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _workout_messages(
     age: int,
     heart_risk: str,
     equipment: list[str],
     injuries: str,
     fitness_goal: str,
-    fitness_level: str = "beginner",
-) -> dict:
-    """Generate a personalized weekly workout plan."""
+    fitness_level: str,
+) -> list[dict]:
     prompt = f"""You are an expert cardiac rehabilitation fitness trainer.
 Create a detailed 7-day workout plan for a patient with these parameters:
 - Age: {age}
@@ -47,35 +73,54 @@ Return ONLY valid JSON with this structure:
   ],
   "safety_notes": ["string"]
 }}"""
+    return [
+        {"role": "system", "content": "You are a cardiac rehabilitation fitness expert. Always return valid JSON."},
+        {"role": "user", "content": prompt},
+    ]
 
+
+async def generate_workout_plan(
+    age: int,
+    heart_risk: str,
+    equipment: list[str],
+    injuries: str,
+    fitness_goal: str,
+    fitness_level: str = "beginner",
+) -> dict:
+    """Generate a personalized weekly workout plan."""
     response = await client.chat.completions.create(
         model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a cardiac rehabilitation fitness expert. Always return valid JSON."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=_workout_messages(age, heart_risk, equipment, injuries, fitness_goal, fitness_level),
         temperature=0.7,
         max_tokens=3000,
     )
+    return parse_json_content(response.choices[0].message.content)
 
-    content = response.choices[0].message.content.strip()
-    # Strip markdown code fences if present
-    if content.startswith("```"):
-        content = content.split("\n", 1)[1]
-        content = content.rsplit("```", 1)[0]
 
-    return json.loads(content)
+def stream_workout_plan(
+    age: int,
+    heart_risk: str,
+    equipment: list[str],
+    injuries: str,
+    fitness_goal: str,
+    fitness_level: str = "beginner",
+) -> AsyncIterator[str]:
+    """Same as generate_workout_plan, but yields the JSON text as tokens arrive."""
+    return _stream_content(
+        _workout_messages(age, heart_risk, equipment, injuries, fitness_goal, fitness_level),
+        temperature=0.7,
+        max_tokens=3000,
+    )
 
 
-async def generate_diet_plan(
+def _diet_messages(
     age: int,
     weight_kg: float,
     height_cm: float,
     heart_risk: str,
     dietary_restrictions: list[str],
     goal: str,
-) -> dict:
-    """Generate a heart-healthy daily meal plan."""
+) -> list[dict]:
     prompt = f"""You are an expert cardiac nutritionist.
 Create a detailed daily meal plan for a patient with these parameters:
 - Age: {age}
@@ -105,23 +150,44 @@ Return ONLY valid JSON with this structure:
   "heart_healthy_tips": ["string"],
   "foods_to_avoid": ["string"]
 }}"""
+    return [
+        {"role": "system", "content": "You are a cardiac nutrition expert. Always return valid JSON."},
+        {"role": "user", "content": prompt},
+    ]
+
 
+async def generate_diet_plan(
+    age: int,
+    weight_kg: float,
+    height_cm: float,
+    heart_risk: str,
+    dietary_restrictions: list[str],
+    goal: str,
+) -> dict:
+    """Generate a heart-healthy daily meal plan."""
     response = await client.chat.completions.create(
         model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a cardiac nutrition expert. Always return valid JSON."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=_diet_messages(age, weight_kg, height_cm, heart_risk, dietary_restrictions, goal),
         temperature=0.7,
         max_tokens=3000,
     )
+    return parse_json_content(response.choices[0].message.content)
 
-    content = response.choices[0].message.content.strip()
-    if content.startswith("```"):
-        content = content.split("\n", 1)[1]
-        content = content.rsplit("```", 1)[0]
 
-    return json.loads(content)
+def stream_diet_plan(
+    age: int,
+    weight_kg: float,
+    height_cm: float,
+    heart_risk: str,
+    dietary_restrictions: list[str],
+    goal: str,
+) -> AsyncIterator[str]:
+    """Same as generate_diet_plan, but yields the JSON text as tokens arrive."""
+    return _stream_content(
+        _diet_messages(age, weight_kg, height_cm, heart_risk, dietary_restrictions, goal),
+        temperature=0.7,
+        max_tokens=3000,
+    )
 
 
 # Age category mapping (matches the CDC BRFSS dataset encoding)
@@ -158,24 +224,25 @@ def _build_profile_text(inputs: dict) -> str:
     return "\n".join(lines)
 
 
-async def generate_risk_recommendations(
-    inputs: dict,
-    risk_category: str,
-    risk_percentage: float,
-) -> dict:
-    """
-    Generate personalized heart disease risk explanations and recommendations
-    based on the patient's specific input values.
-    """
-    profile = _build_profile_text(inputs)
+def _build_drivers_text(risk_drivers: list[dict] | None) -> str:
+    """Render the model's own feature attributions as prompt context."""
+    if not risk_drivers:
+        return ""
+    lines = [
+        f"- {d['label']}: {'+' if d['contribution'] >= 0 else ''}{d['contribution']:.1f} percentage points"
+        for d in risk_drivers
+    ]
+    return "\nTop model risk drivers (from the ML model's own attribution):\n" + "\n".join(lines) + "\n"
 
+
+def _risk_messages(profile: str, drivers: str, risk_category: str, risk_percentage: float) -> list[dict]:
     prompt = f"""You are a cardiologist and preventive health expert analyzing a patient's heart disease risk assessment.
 
 Patient Profile:
 {profile}
 
 ML Model Result: {risk_percentage:.1f}% heart disease risk — classified as **{risk_category}** risk.
-
+{drivers}
 Based ONLY on this patient's specific values above, provide a personalized analysis. Be direct and specific — reference the actual values (e.g. "Your BMI of 32 puts you in the obese range", not generic advice).
 
 Return ONLY valid JSON in this exact structure:
@@ -209,23 +276,90 @@ Rules:
 - Include 2-4 medical_recommendations
 - Be empathetic but honest
 - Do NOT make up conditions not present in the profile"""
+    return [
+        {
+            "role": "system",
+            "content": "You are an expert cardiologist providing personalized heart health analysis. Always return valid JSON only.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _parse_recommendations(content: str) -> dict:
+    """Parse and validate a risk recommendation reply; raises on a malformed one."""
+    return Recommendations(**parse_json_content(content)).model_dump()
+
+
+def _risk_cache_key(profile: str, drivers: str, risk_category: str, risk_percentage: float) -> str:
+    return recommendation_cache.cache_key(
+        RISK_PROMPT_VERSION,
+        RISK_MODEL,
+        profile=profile,
+        risk_category=risk_category,
+        risk_percentage=f"{risk_percentage:.1f}",
+        drivers=drivers,
+    )
+
+
+async def generate_risk_recommendations(
+    inputs: dict,
+    risk_category: str,
+    risk_percentage: float,
+    risk_drivers: list[dict] | None = None,
+) -> dict:
+    """
+    Generate personalized heart disease risk explanations and recommendations
+    based on the patient's specific input values. risk_drivers (from
+    ml_service attributions) ground the explanation in what the model used.
+    Results are cached in MongoDB by prompt inputs, so repeat profiles skip GPT.
+    """
+    profile = _build_profile_text(inputs)
+    drivers = _build_drivers_text(risk_drivers)
+    key = _risk_cache_key(profile, drivers, risk_category, risk_percentage)
+    cached = await recommendation_cache.get_cached(key)
+    if cached is not None:
+        return cached
 
     response = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": "You are an expert cardiologist providing personalized heart health analysis. Always return valid JSON only.",
-            },
-            {"role": "user", "content": prompt},
-        ],
+        model=RISK_MODEL,
+        messages=_risk_messages(profile, drivers, risk_category, risk_percentage),
         temperature=0.5,
         max_tokens=1500,
     )
 
-    content = response.choices[0].message.content.strip()
-    if content.startswith("```"):
-        content = content.split("\n", 1)[1]
-        content = content.rsplit("```", 1)[0]
+    # Validate before caching so a malformed reply isn't served for the whole TTL
+    recommendations = _parse_recommendations(response.choices[0].message.content)
+    await recommendation_cache.store(key, RISK_PROMPT_VERSION, recommendations)
+    return recommendations
+
+
+async def stream_risk_recommendations(
+    inputs: dict,
+    risk_category: str,
+    risk_percentage: float,
+    risk_drivers: list[dict] | None = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming generate_risk_recommendations: yields the JSON text as tokens
+    arrive (a cache hit is yielded in one piece) and caches the final result.
+    """
+    profile = _build_profile_text(inputs)
+    drivers = _build_drivers_text(risk_drivers)
+    key = _risk_cache_key(profile, drivers, risk_category, risk_percentage)
+    cached = await recommendation_cache.get_cached(key)
+    if cached is not None:
+        yield json.dumps(cached)
+        return
+
+    parts = []
+    async for delta in _stream_content(
+        _risk_messages(profile, drivers, risk_category, risk_percentage),
+        temperature=0.5,
+        max_tokens=1500,
+        model=RISK_MODEL,
+    ):
+        parts.append(delta)
+        yield delta
 
-    return json.loads(content)
+    recommendations = _parse_recommendations("".join(parts))
+    await recommendation_cache.store(key, RISK_PROMPT_VERSION, recommendations)
@@ -0,0 +1,258 @@
+"""
+Prediction Writer — write-behind persistence for prediction records.
+Routes hand documents to the buffer (with a client-side ObjectId) and return
+without waiting for MongoDB; a background loop flushes them with one
+insert_many(ordered=False) when max_batch_size documents are waiting or
+flush_interval_ms has passed. The buffer is bounded: when max_pending
+documents are waiting, callers wait for a flush (backpressure), and get a
+RuntimeError after max_wait_ms so requests fail fast while MongoDB is down.
+Documents that are still buffered are visible through get()/update(), so
+reads right after a write see it; everything left is flushed on shutdown.
+after_write hooks receive each batch of stored documents and maintain
+the derived collections (user_stats, risk_daily) and response caches.
+"""
+
+import time
+import asyncio
+from typing import Awaitable, Callable, Sequence
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+from config import get_settings
+from database import get_db
+from services.user_stats import record_predictions
+from services.risk_rollup import record_daily_risk
+from services.response_cache import invalidate
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindBuffer:
+    """Batches inserts into one collection off the request path."""
+
+    def __init__(self, collection: str, max_batch_size: int = 100, flush_interval_ms: int = 200,
+                 max_pending: int = 5000, max_wait_ms: int = 2000, after_write: Sequence[Callable[[list[dict]], Awaitable]] = ()):
+        self.collection = collection
+        self.after_write = list(after_write)
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self.max_wait = max_wait_ms / 1000
+        self._pending: dict[ObjectId, dict] = {}
+        # Documents in an insert_many that hasn't returned yet, with its completion event
+        self._in_flight: dict[ObjectId, tuple[dict, asyncio.Event]] = {}
+        # Documents put back after a failed flush; that flush may have stored some of them
+        self._requeued: set[ObjectId] = set()
+        self._wake: asyncio.Event | None = None
+        self._space: asyncio.Event | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+        self._stats = {
+            "flushes": 0, "written": 0, "failed": 0, "retried": 0,
+            "backpressure_waits": 0, "rejected": 0, "last_flush_size": 0, "last_flush_ms": 0.0, "total_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the flush loop (called from the FastAPI lifespan)."""
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+        print(f"💾 Write-behind buffer for '{self.collection}' started (batch ≤{self.max_batch_size}, "
+              f"every {int(self.flush_interval * 1000)}ms, ≤{self.max_pending} pending)")
+
+    async def stop(self):
+        """Stop the loop and flush everything still buffered."""
+        if self._flush_lock is None:
+            return
+        if self._task:
+            # Take the lock so the loop is never cancelled in the middle of an insert
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _ in range(3):
+            if not self._pending:
+                break
+            await self.flush()
+        if self._pending:
+            print(f"⚠️  {len(self._pending)} '{self.collection}' document(s) could not be written on shutdown")
+
+    async def add(self, doc: dict) -> ObjectId:
+        """Buffer one document for insertion and return its _id."""
+        doc.setdefault("_id", ObjectId())
+        if not self.running:
+            # Buffer not started (e.g. scripts) — write through
+            await get_db()[self.collection].insert_one(doc)
+            await self.notify_written([doc])
+            return doc["_id"]
+
+        deadline = time.monotonic() + self.max_wait
+        while len(self._pending) >= self.max_pending:
+            self._stats["backpressure_waits"] += 1
+            self._space.clear()
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                self._stats["rejected"] += 1
+                raise RuntimeError(f"'{self.collection}' storage is unavailable, please retry") from None
+
+        self._pending[doc["_id"]] = doc
+        if len(self._pending) >= self.max_batch_size:
+            self._wake.set()
+        return doc["_id"]
+
+    def get(self, oid: ObjectId) -> dict | None:
+        """A buffered (not yet acknowledged) document, or None."""
+        if oid in self._pending:
+            return dict(self._pending[oid])
+        if oid in self._in_flight:
+            return dict(self._in_flight[oid][0])
+        return None
+
+    async def update(self, oid: ObjectId, fields: dict):
+        """$set top-level fields on a document, whether it is still buffered or already stored."""
+        while True:
+            if oid in self._pending:
+                self._pending[oid].update(fields)
+                return
+            if oid in self._in_flight:
+                # Wait for its insert to land (or be requeued) before updating
+                await self._in_flight[oid][1].wait()
+                continue
+            break
+        await get_db()[self.collection].update_one({"_id": oid}, {"$set": fields})
+
+    async def flush(self):
+        """Write everything currently buffered in one insert_many."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            done = asyncio.Event()
+            for oid, doc in batch.items():
+                self._in_flight[oid] = (doc, done)
+
+            start = time.perf_counter()
+            docs = list(batch.values())
+            written = docs
+            failed = 0
+            try:
+                await get_db()[self.collection].insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                rejected = {err["index"] for err in write_errors}
+                written = [doc for i, doc in enumerate(docs) if i not in rejected]
+                # A duplicate of a requeued document means the failed flush stored it after all:
+                # overwrite it with the buffered copy (updates may have landed since) and count it
+                stored_earlier = {
+                    err["index"] for err in write_errors
+                    if err.get("code") == DUPLICATE_KEY and docs[err["index"]]["_id"] in self._requeued
+                }
+                errors = [err for err in write_errors if err["index"] not in stored_earlier]
+                if stored_earlier:
+                    replacements = [docs[i] for i in sorted(stored_earlier)]
+                    try:
+                        await get_db()[self.collection].bulk_write(
+                            [ReplaceOne({"_id": doc["_id"]}, doc) for doc in replacements], ordered=False,
+                        )
+                        written += replacements
+                    except Exception as replace_err:
+                        print(f"⚠️  Re-writing {len(replacements)} requeued '{self.collection}' document(s) "
+                              f"failed, will retry: {replace_err}")
+                        self._stats["retried"] += len(replacements)
+                        for doc in replacements:
+                            del batch[doc["_id"]]
+                        self._pending = {**{doc["_id"]: doc for doc in replacements}, **self._pending}
+                failed = len(errors)
+                if errors:
+                    print(f"⚠️  {failed} '{self.collection}' insert(s) failed: {errors[0].get('errmsg')}")
+            except Exception as e:
+                # Mongo unreachable — put the batch back and retry on the next flush
+                print(f"⚠️  Flushing {len(batch)} '{self.collection}' document(s) failed, will retry: {e}")
+                self._stats["retried"] += len(batch)
+                self._requeued.update(batch)
+                self._pending = {**batch, **self._pending}
+                batch = {}
+                written = []
+            finally:
+                for oid in list(self._in_flight):
+                    if self._in_flight[oid][1] is done:
+                        del self._in_flight[oid]
+                done.set()
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._requeued.difference_update(batch)
+            if batch:
+                self._stats["flushes"] += 1
+                self._stats["written"] += len(batch) - failed
+                self._stats["failed"] += failed
+                self._stats["last_flush_size"] = len(batch)
+                self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+                self._stats["total_flush_ms"] += elapsed_ms
+            if len(self._pending) < self.max_pending:
+                self._space.set()
+        await self.notify_written(written)
+
+    async def notify_written(self, docs: list[dict]):
+        """Run the after_write hooks for documents stored in the collection (also by other paths)."""
+        if not docs:
+            return
+        for hook in self.after_write:
+            try:
+                await hook(docs)
+            except Exception as e:
+                print(f"⚠️  {hook.__name__} failed for {len(docs)} '{self.collection}' document(s): {e}")
+
+    def stats(self) -> dict:
+        flushes = self._stats["flushes"]
+        return {
+            **self._stats,
+            "total_flush_ms": round(self._stats["total_flush_ms"], 2),
+            "avg_flush_size": round(self._stats["written"] / flushes, 2) if flushes else 0.0,
+            "avg_flush_ms": round(self._stats["total_flush_ms"] / flushes, 2) if flushes else 0.0,
+            "pending": len(self._pending),
+            "in_flight": len(self._in_flight),
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Write-behind flush loop error: {e}")
+
+
+async def invalidate_prediction_caches(docs: list[dict]):
+    """Expire cached dashboard responses once new predictions are readable."""
+    for user_id in {doc["user_id"] for doc in docs}:
+        await invalidate(user_id, "predictions")
+
+
+_settings = get_settings()
+prediction_writer = WriteBehindBuffer(
+    "predictions",
+    max_batch_size=_settings.PREDICTION_WRITE_BATCH_SIZE,
+    flush_interval_ms=_settings.PREDICTION_WRITE_FLUSH_MS,
+    max_pending=_settings.PREDICTION_WRITE_MAX_PENDING,
+    max_wait_ms=_settings.PREDICTION_WRITE_MAX_WAIT_MS,
+    after_write=[record_predictions, record_daily_risk, invalidate_prediction_caches],
+)
@@ -0,0 +1,99 @@
+"""
+Recommendation Cache — persistent MongoDB cache for GPT risk recommendations.
+Entries are keyed by a SHA-256 of the exact prompt inputs (rendered profile,
+risk category, rounded risk percentage, rendered drivers) plus the prompt
+template version, so identical profiles skip the GPT call and editing the
+template invalidates old entries. A TTL index expires entries automatically.
+"""
+
+import json
+import hashlib
+from datetime import datetime
+from pymongo.errors import OperationFailure
+from config import get_settings
+from database import get_db
+
+settings = get_settings()
+
+COLLECTION = "recommendation_cache"
+
+# Process-local hit/miss counters (reported by /admin/recommendation-cache)
+_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def cache_key(template_version: str, model: str, **prompt_inputs) -> str:
+    """Canonical hash of everything that shapes the prompt."""
+    canonical = json.dumps(
+        {"template": template_version, "model": model, **prompt_inputs},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def ensure_indexes():
+    """Create the TTL index, updating its expiry if the setting changed."""
+    db = get_db()
+    ttl = settings.RECOMMENDATION_CACHE_TTL_SECONDS
+    try:
+        await db[COLLECTION].create_index("created_at", expireAfterSeconds=ttl)
+    except OperationFailure:
+        # Existing TTL index with a different expiry — change it in place
+        await db.command({
+            "collMod": COLLECTION,
+            "index": {"keyPattern": {"created_at": 1}, "expireAfterSeconds": ttl},
+        })
+
+
+async def get_cached(key: str) -> dict | None:
+    """Return cached recommendations for key (bumping its hit count), or None."""
+    if not settings.RECOMMENDATION_CACHE_ENABLED:
+        return None
+    try:
+        doc = await get_db()[COLLECTION].find_one_and_update(
+            {"_id": key},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.utcnow()}},
+            projection={"recommendations": 1},
+        )
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"⚠️  Recommendation cache lookup failed: {e}")
+        return None
+    if doc is None:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return doc["recommendations"]
+
+
+async def store(key: str, template_version: str, recommendations: dict):
+    """Save freshly generated recommendations (failures are logged, not raised)."""
+    if not settings.RECOMMENDATION_CACHE_ENABLED:
+        return
+    try:
+        await get_db()[COLLECTION].update_one(
+            {"_id": key},
+            {
+                "$set": {
+                    "template_version": template_version,
+                    "recommendations": recommendations,
+                    "created_at": datetime.utcnow(),
+                },
+                "$setOnInsert": {"hits": 0},
+            },
+            upsert=True,
+        )
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"⚠️  Recommendation cache write failed: {e}")
+
+
+async def cache_info() -> dict:
+    """Hit rate for this process plus the size of the shared cache."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": await get_db()[COLLECTION].estimated_document_count(),
+        "ttl_seconds": settings.RECOMMENDATION_CACHE_TTL_SECONDS,
+    }
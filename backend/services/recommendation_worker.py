@@ -0,0 +1,98 @@
+"""
+Recommendation Worker — generates GPT risk recommendations after the
+prediction has already been returned to the client.
+Results are written onto the prediction document (recommendations_status:
+pending → ready | failed); in-process waiters (SSE streams) are woken up
+as soon as their prediction completes. run_in_background() runs other
+follow-up work (e.g. finishing a streamed plan whose client disconnected)
+under the same shutdown drain.
+"""
+
+import asyncio
+from bson import ObjectId
+from models.prediction import Recommendations
+from services.openai_service import generate_risk_recommendations
+from services.prediction_writer import prediction_writer
+from services.response_cache import invalidate
+
+# Max concurrent GPT calls made by the worker
+MAX_CONCURRENT_RECOMMENDATIONS = 8
+
+_semaphore = asyncio.Semaphore(MAX_CONCURRENT_RECOMMENDATIONS)
+_tasks: set[asyncio.Task] = set()
+_waiters: dict[str, asyncio.Event] = {}
+
+
+async def _generate(prediction_id: str, user_id: str, inputs: dict, risk_category: str,
+                    risk_percentage: float, risk_drivers: list[dict] | None):
+    update = {"recommendations_status": "failed"}
+    try:
+        async with _semaphore:
+            rec_data = await generate_risk_recommendations(
+                inputs=inputs,
+                risk_category=risk_category,
+                risk_percentage=risk_percentage,
+                risk_drivers=risk_drivers,
+            )
+        update = {
+            "recommendations": Recommendations(**rec_data).model_dump(),
+            "recommendations_status": "ready",
+        }
+    except Exception as rec_err:
+        print(f"⚠️  Recommendations generation failed for {prediction_id}: {rec_err}")
+    finally:
+        # The prediction may still be in the write-behind buffer
+        await prediction_writer.update(ObjectId(prediction_id), update)
+        # Risk history shows whether recommendations exist
+        await invalidate(user_id, "predictions")
+        event = _waiters.pop(prediction_id, None)
+        if event:
+            event.set()
+
+
+def schedule_recommendations(
+    prediction_id: str,
+    user_id: str,
+    inputs: dict,
+    risk_category: str,
+    risk_percentage: float,
+    risk_drivers: list[dict] | None = None,
+):
+    """Start generating recommendations for a stored prediction in the background."""
+    _waiters.setdefault(prediction_id, asyncio.Event())
+    task = asyncio.create_task(
+        _generate(prediction_id, user_id, inputs, risk_category, risk_percentage, risk_drivers)
+    )
+    # Keep a reference so the task isn't garbage-collected mid-flight
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def run_in_background(coro):
+    """Run a coroutine detached from the request; drain() waits for it on shutdown."""
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def wait_for_recommendations(prediction_id: str, timeout: float) -> bool:
+    """
+    Wait up to `timeout` seconds for a prediction generated by this process.
+    Returns False on timeout or when the job runs in another worker (callers re-check Mongo).
+    """
+    event = _waiters.get(prediction_id)
+    if event is None:
+        await asyncio.sleep(timeout)
+        return False
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def drain(timeout: float = 30.0):
+    """Let in-flight generations finish on shutdown (called from the lifespan)."""
+    if _tasks:
+        print(f"⏳ Waiting for {len(_tasks)} background job(s)...")
+        await asyncio.wait(list(_tasks), timeout=timeout)
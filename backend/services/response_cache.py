@@ -0,0 +1,143 @@
+"""
+Response Cache — per-user, per-route caching of read-heavy JSON responses.
+Each user has a generation counter per data scope ("predictions",
+"medications", "workouts", "diets"); write routes bump the scopes they
+touch. A cached response is valid while the generations it was built from
+are unchanged, and its ETag is derived from those generations alone, so a
+matching If-None-Match is answered with 304 before any database work.
+
+The default MemoryBackend is an in-process LRU, so invalidation is only
+visible to the worker that handled the write. With several API workers,
+call set_backend() with a shared implementation (e.g. Redis) of CacheBackend.
+"""
+
+import json
+import time
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from config import get_settings
+
+settings = get_settings()
+
+SCOPES = ("predictions", "medications", "workouts", "diets")
+
+
+class CacheBackend(ABC):
+    """Storage interface for cached responses and generation counters."""
+
+    @abstractmethod
+    async def get(self, key: str) -> tuple | None:
+        """The cached (etag, body, headers) for key, or None."""
+
+    @abstractmethod
+    async def set(self, key: str, value: tuple):
+        """Store (etag, body, headers) under key."""
+
+    @abstractmethod
+    async def generations(self, user_id: str, scopes: tuple[str, ...]) -> list[int]:
+        """The user's current generation for each scope."""
+
+    @abstractmethod
+    async def bump(self, user_id: str, scopes: tuple[str, ...]):
+        """Advance the user's generation for each scope."""
+
+    def info(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU of responses plus a dict of generation counters."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._generations: dict[tuple[str, str], int] = {}
+        # Counters start at the boot time so ETags issued before a restart never match again
+        self._base = int(time.time() * 1000)
+
+    async def get(self, key: str) -> tuple | None:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: tuple):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def generations(self, user_id: str, scopes: tuple[str, ...]) -> list[int]:
+        return [self._generations.get((user_id, scope), self._base) for scope in scopes]
+
+    async def bump(self, user_id: str, scopes: tuple[str, ...]):
+        for scope in scopes:
+            key = (user_id, scope)
+            self._generations[key] = self._generations.get(key, self._base) + 1
+
+    def info(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries}
+
+
+_backend: CacheBackend = MemoryBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+_stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+def set_backend(backend: CacheBackend):
+    """Swap in another cache store (e.g. one shared by all workers)."""
+    global _backend
+    _backend = backend
+
+
+async def invalidate(user_id: str, *scopes: str):
+    """Bump the user's generation for each scope (call after every write)."""
+    await _backend.bump(user_id, scopes)
+
+
+async def cached_json(
+    request: Request,
+    user_id: str,
+    scopes: tuple[str, ...],
+    build: Callable[[], Awaitable[tuple[object, dict]]],
+    vary: str = "",
+) -> Response:
+    """
+    Serve build()'s (content, extra_headers) as JSON through the cache.
+    `vary` adds anything else the response depends on (e.g. today's date).
+    """
+    route = f"{request.url.path}?{request.url.query}"
+    generations = await _backend.generations(user_id, scopes)
+    etag = '"' + hashlib.sha1(f"{user_id}|{route}|{generations}|{vary}".encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if request.headers.get("if-none-match") == etag:
+        _stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+
+    key = f"{user_id}|{route}"
+    cached = await _backend.get(key) if settings.RESPONSE_CACHE_ENABLED else None
+    if cached is not None and cached[0] == etag:
+        _stats["hits"] += 1
+        _, body, extra_headers = cached
+    else:
+        _stats["misses"] += 1
+        content, extra_headers = await build()
+        body = json.dumps(jsonable_encoder(content)).encode()
+        if settings.RESPONSE_CACHE_ENABLED:
+            await _backend.set(key, (etag, body, extra_headers))
+
+    return Response(content=body, media_type="application/json", headers={**headers, **extra_headers})
+
+
+def cache_info() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "backend": type(_backend).__name__,
+        **_backend.info(),
+    }
@@ -0,0 +1,104 @@
+"""
+Risk Rollup — pre-aggregated daily risk per user (risk_daily collection).
+Each document is {user_id, day: "YYYY-MM-DD" (UTC), count, sum, min, max}
+of risk_percentage, upserted with $inc/$min/$max whenever predictions are
+stored. The progress-trend chart reads the last N days with an index range
+scan on (user_id, day) instead of re-aggregating the full history.
+
+Backfill from backend/:
+  python -m services.risk_rollup              # every user
+  python -m services.risk_rollup --user <id>  # one user
+"""
+
+import asyncio
+import argparse
+from collections import defaultdict
+from pymongo import UpdateOne
+from database import get_db
+
+COLLECTION = "risk_daily"
+DAY_FORMAT = "%Y-%m-%d"
+
+
+async def record_daily_risk(records: list[dict]):
+    """Fold newly stored prediction records into their (user, day) rollups."""
+    if not records:
+        return
+    groups: dict[tuple[str, str], list[float]] = defaultdict(list)
+    for record in records:
+        day = record["created_at"].strftime(DAY_FORMAT)
+        groups[(record["user_id"], day)].append(record["risk_percentage"])
+
+    ops = [
+        UpdateOne(
+            {"user_id": user_id, "day": day},
+            {
+                "$inc": {"count": len(risks), "sum": sum(risks)},
+                "$min": {"min": min(risks)},
+                "$max": {"max": max(risks)},
+            },
+            upsert=True,
+        )
+        for (user_id, day), risks in groups.items()
+    ]
+    await get_db()[COLLECTION].bulk_write(ops, ordered=False)
+
+
+async def get_daily_risk(user_id: str, days: int) -> list[dict]:
+    """The user's most recent `days` rollups, oldest first."""
+    cursor = (
+        get_db()[COLLECTION]
+        .find({"user_id": user_id}, {"_id": 0, "user_id": 0})
+        .sort("day", -1)
+        .limit(days)
+    )
+    rollups = await cursor.to_list(length=days)
+    rollups.reverse()
+    return rollups
+
+
+async def backfill(user_id: str | None = None):
+    """Rebuild rollups from the predictions collection (replaces existing days)."""
+    pipeline = [
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "day": {"$dateToString": {"format": DAY_FORMAT, "date": "$created_at"}},
+            },
+            "count": {"$sum": 1},
+            "sum": {"$sum": "$risk_percentage"},
+            "min": {"$min": "$risk_percentage"},
+            "max": {"$max": "$risk_percentage"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "day": "$_id.day",
+            "count": 1, "sum": 1, "min": 1, "max": 1,
+        }},
+        {"$merge": {"into": COLLECTION, "on": ["user_id", "day"],
+                    "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    if user_id:
+        pipeline.insert(0, {"$match": {"user_id": user_id}})
+    # $merge writes server-side; iterating the cursor just runs the pipeline
+    async for _ in get_db().predictions.aggregate(pipeline):
+        pass
+
+
+async def _main(user_id: str | None):
+    from database import connect_db, close_db
+
+    await connect_db()
+    try:
+        await backfill(user_id)
+        print(f"✅ Backfilled {COLLECTION} for {user_id or 'all users'}")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the risk_daily rollup from predictions")
+    parser.add_argument("--user", default=None, help="backfill a single user (default: all users)")
+    args = parser.parse_args()
+    asyncio.run(_main(args.user))
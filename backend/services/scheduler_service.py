@@ -142,4 +142,42 @@ async def reschedule_all_on_startup(db):
             count += 1
         print(f"Rescheduled {count} active medication reminder(s)")
     except Exception as e:
-        print(f"Startup reschedule failed: {e}")
\ No newline at end of file
+        print(f"Startup reschedule failed: {e}")
+
+
+def schedule_streak_reset(db):
+    """Nightly job (00:05 local) that zeroes medication streaks broken by a missed day."""
+    from services.adherence import reset_broken_streaks
+
+    async def _run():
+        try:
+            count = await reset_broken_streaks(db)
+            print(f"Reset {count} broken medication streak(s)")
+        except Exception as e:
+            print(f"Nightly streak reset failed: {e}")
+
+    scheduler.add_job(
+        _run,
+        trigger=CronTrigger(hour=0, minute=5, timezone=_local_tz),
+        id="streak_reset",
+        replace_existing=True,
+    )
+
+
+def schedule_missed_doses():
+    """Nightly job (00:10 local) that logs yesterday's unrecorded scheduled doses as missed."""
+    from services.dose_events import record_missed_doses
+
+    async def _run():
+        try:
+            count = await record_missed_doses()
+            print(f"Logged {count} missed dose(s)")
+        except Exception as e:
+            print(f"Nightly missed-dose logging failed: {e}")
+
+    scheduler.add_job(
+        _run,
+        trigger=CronTrigger(hour=0, minute=10, timezone=_local_tz),
+        id="missed_doses",
+        replace_existing=True,
+    )
@@ -0,0 +1,93 @@
+"""
+Streaming helpers — Server-Sent Events formatting and an incremental parser
+for the JSON objects GPT returns, so complete pieces of a plan (a workout
+day, a meal, a recommendation) can be forwarded while tokens still arrive.
+"""
+
+import json
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def parse_json_content(content: str):
+    """Parse a GPT JSON reply, stripping markdown code fences if present."""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1]
+        content = content.rsplit("```", 1)[0]
+    return json.loads(content)
+
+
+class JsonStreamParser:
+    """
+    Incremental scanner over a streamed top-level JSON object.
+    feed() returns what completed in the new text:
+      ("field", key, value) — a top-level string value, e.g. plan_name
+      ("item", key, value)  — an element of a top-level array, e.g. one day of weekly_plan
+    Numbers and other scalars at the top level are only available via result().
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._pending_key = None
+        # One (bracket, key) entry per open container; the root object is depth 1
+        self._stack: list[tuple[str, str | None]] = []
+        self._item_start = None
+
+    def feed(self, text: str) -> list[tuple[str, str, object]]:
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        while self._pos < len(buffer):
+            ch = buffer[self._pos]
+            depth = len(self._stack)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    raw = buffer[self._string_start:self._pos + 1]
+                    if depth == 1 and self._pending_key is not None:
+                        completed.append(("field", self._pending_key, json.loads(raw)))
+                        self._pending_key = None
+                    elif depth == 2 and self._stack[-1][0] == "[":
+                        completed.append(("item", self._stack[-1][1], json.loads(raw)))
+                    else:
+                        self._last_string = json.loads(raw)
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif ch == ":":
+                self._pending_key = self._last_string
+            elif ch == ",":
+                self._pending_key = None
+            elif ch in "{[":
+                key = self._pending_key if depth and self._stack[-1][0] == "{" else None
+                if depth == 2 and self._stack[-1][0] == "[":
+                    self._item_start = self._pos
+                self._stack.append((ch, key))
+                self._pending_key = None
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if len(self._stack) == 2 and self._item_start is not None:
+                    raw = buffer[self._item_start:self._pos + 1]
+                    completed.append(("item", self._stack[-1][1], json.loads(raw)))
+                    self._item_start = None
+            self._pos += 1
+        return completed
+
+    def result(self):
+        """The complete parsed object (call once the stream has ended)."""
+        return parse_json_content(self.buffer)
@@ -0,0 +1,187 @@
+"""
+User Stats — materialized per-user dashboard summary (user_stats collection).
+One document per user (_id = Clerk user id) holds the assessment count,
+latest risk and BMI, and medication totals. Prediction and medication
+writes update it atomically, so GET /dashboard/stats is a single _id
+lookup no matter how long a user's history is. rebuild_user_stats()
+recomputes documents from the source collections.
+Write paths never upsert partial documents: a user without one is seeded
+from a full rebuild ($setOnInsert), and every write bumps `version` so a
+rebuild never replaces a document that changed while it was counting.
+
+Rebuild from backend/ (run once when deploying over existing data, so every
+user already has a document before the write paths start updating them):
+  python -m services.user_stats              # every user
+  python -m services.user_stats --user <id>  # one user
+"""
+
+import asyncio
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from pymongo import UpdateOne
+from database import get_db
+
+COLLECTION = "user_stats"
+# Fields every complete stats document has
+REQUIRED_FIELDS = ("total_assessments", "latest_risk", "medications_total", "medications_taken")
+
+
+def _latest_cond(field: str, value, created_at: datetime) -> dict:
+    """Pipeline expression: `value` if created_at is newer than the stored latest prediction."""
+    return {
+        "$cond": [
+            {"$gt": [created_at, {"$ifNull": ["$latest_risk.date", datetime.min]}]},
+            {"$literal": value},
+            f"${field}",
+        ]
+    }
+
+
+async def record_predictions(records: list[dict]):
+    """Fold newly stored prediction records into their users' stats (one update per user)."""
+    if not records:
+        return
+    by_user: dict[str, list[dict]] = defaultdict(list)
+    for record in records:
+        by_user[record["user_id"]].append(record)
+
+    collection = get_db()[COLLECTION]
+    existing = {doc["_id"] async for doc in collection.find({"_id": {"$in": list(by_user)}}, {"_id": 1})}
+    for user_id in set(by_user) - existing:
+        # No document yet: seed it from the source collections, which already hold these records
+        await rebuild_user_stats(user_id)
+
+    ops = []
+    for user_id, user_records in by_user.items():
+        if user_id not in existing:
+            continue
+        latest = max(user_records, key=lambda r: r["created_at"])
+        latest_risk = {
+            "percentage": latest["risk_percentage"],
+            "category": latest["risk_category"],
+            "date": latest["created_at"],
+        }
+        # Pipeline update: $inc the count and replace latest_* only if this record is newer
+        ops.append(UpdateOne(
+            {"_id": user_id},
+            [{
+                "$set": {
+                    "total_assessments": {"$add": [{"$ifNull": ["$total_assessments", 0]}, len(user_records)]},
+                    "latest_bmi": _latest_cond("latest_bmi", latest.get("input_data", {}).get("bmi"),
+                                               latest["created_at"]),
+                    "latest_risk": _latest_cond("latest_risk", latest_risk, latest["created_at"]),
+                    "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+                    "updated_at": "$$NOW",
+                }
+            }],
+        ))
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+
+
+async def adjust_medications(user_id: str, total: int = 0, taken: int = 0):
+    """Apply medication count deltas (e.g. total=1 on add, taken=-1 when un-taking)."""
+    if not total and not taken:
+        return
+    result = await get_db()[COLLECTION].update_one(
+        {"_id": user_id},
+        {
+            "$inc": {"medications_total": total, "medications_taken": taken, "version": 1},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+    )
+    if result.matched_count == 0:
+        # No document yet: seed it from the source collections, which already reflect this change
+        await rebuild_user_stats(user_id)
+
+
+async def get_user_stats(user_id: str) -> dict:
+    """The user's stats document, built from the source collections on first access."""
+    doc = await get_db()[COLLECTION].find_one({"_id": user_id})
+    # Partial documents left by earlier upserting write paths are rebuilt too
+    if doc is None or any(field not in doc for field in REQUIRED_FIELDS):
+        doc = await rebuild_user_stats(user_id)
+    return doc
+
+
+async def _compute_user_stats(user_id: str) -> dict:
+    """One user's stats computed from predictions and medications."""
+    db = get_db()
+    latest = await db.predictions.find_one(
+        {"user_id": user_id},
+        {"risk_percentage": 1, "risk_category": 1, "created_at": 1, "input_data.bmi": 1},
+        sort=[("created_at", -1)],
+    )
+    doc = {
+        "_id": user_id,
+        "total_assessments": await db.predictions.count_documents({"user_id": user_id}),
+        "latest_risk": {
+            "percentage": latest["risk_percentage"],
+            "category": latest["risk_category"],
+            "date": latest["created_at"],
+        } if latest else None,
+        "latest_bmi": latest.get("input_data", {}).get("bmi") if latest else None,
+        "medications_total": await db.medications.count_documents({"user_id": user_id}),
+        "medications_taken": await db.medications.count_documents({"user_id": user_id, "adherence_status": True}),
+        "updated_at": datetime.utcnow(),
+    }
+    return doc
+
+
+async def rebuild_user_stats(user_id: str) -> dict:
+    """
+    Recompute one user's stats and store them. A missing document is
+    inserted with $setOnInsert; an existing one is replaced only if its
+    version didn't change while counting, so concurrent $inc's aren't lost.
+    """
+    collection = get_db()[COLLECTION]
+    for _ in range(3):
+        current = await collection.find_one({"_id": user_id}, {"version": 1})
+        doc = await _compute_user_stats(user_id)
+        if current is None:
+            seed = {key: value for key, value in doc.items() if key != "_id"}
+            result = await collection.update_one(
+                {"_id": user_id}, {"$setOnInsert": {**seed, "version": 0}}, upsert=True,
+            )
+            if result.upserted_id is not None:
+                return {**doc, "version": 0}
+            continue  # a write path created it meanwhile — recount against its version
+        version = current.get("version")
+        doc["version"] = (version or 0) + 1
+        result = await collection.replace_one({"_id": user_id, "version": version}, doc)
+        if result.matched_count:
+            return doc
+    print(f"⚠️  Stats for {user_id} kept changing during rebuild — leaving the current document")
+    return await collection.find_one({"_id": user_id})
+
+
+async def rebuild_all_user_stats() -> int:
+    """Rebuild the stats document of every user with predictions or medications."""
+    db = get_db()
+    user_ids = set(await db.predictions.distinct("user_id")) | set(await db.medications.distinct("user_id"))
+    for user_id in user_ids:
+        await rebuild_user_stats(user_id)
+    return len(user_ids)
+
+
+async def _main(user_id: str | None):
+    from database import connect_db, close_db
+
+    await connect_db()
+    try:
+        if user_id:
+            await rebuild_user_stats(user_id)
+            print(f"✅ Rebuilt stats for {user_id}")
+        else:
+            count = await rebuild_all_user_stats()
+            print(f"✅ Rebuilt stats for {count} user(s)")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild materialized dashboard stats")
+    parser.add_argument("--user", default=None, help="rebuild a single user (default: all users)")
+    args = parser.parse_args()
+    asyncio.run(_main(args.user))
@@ -0,0 +1,9 @@
+"""
+Shared pytest setup: run from backend/ (uv run pytest) with the backend
+root importable, the same way main.py and the ml/ scripts see it.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,137 @@
+"""Adherence bitmap: set_day, streak and rate."""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("bson")
+
+from services.adherence import (  # noqa: E402
+    current_streak, from_dates, last_day, rate, read, set_day, streak, take_pipeline,
+)
+
+ORIGIN = date(2024, 1, 1)
+
+
+def _days(*offsets: int) -> list[date]:
+    return [ORIGIN + timedelta(days=o) for o in offsets]
+
+
+def _bitmap(*offsets: int) -> tuple[date, bytes]:
+    origin, bits = ORIGIN, b""
+    for day in _days(*offsets):
+        origin, bits = set_day(origin, bits, day)
+    return origin, bits
+
+
+def test_set_day_sets_one_bit():
+    origin, bits = set_day(ORIGIN, b"", ORIGIN + timedelta(days=9))
+    assert origin == ORIGIN
+    assert bits == bytes([0, 0b10])
+
+
+def test_set_day_is_idempotent():
+    assert _bitmap(3, 3) == _bitmap(3)
+
+
+def test_set_day_before_origin_rebases_by_whole_bytes():
+    origin, bits = _bitmap(0, 5)
+    origin, bits = set_day(origin, bits, ORIGIN - timedelta(days=3))
+    assert origin == ORIGIN - timedelta(days=8)
+    # Existing bits keep their byte alignment, shifted by one byte
+    assert bits == bytes([0b00100000, 0b00100001])
+    assert last_day(origin, bits) == ORIGIN + timedelta(days=5)
+
+
+def test_from_dates_matches_set_day():
+    origin, bits = from_dates(["2024-01-03", "2024-01-01", "not-a-date", "2024-01-02"])
+    assert (origin, bits) == _bitmap(0, 1, 2)
+
+
+def test_streak_counts_run_ending_today():
+    origin, bits = _bitmap(0, 2, 3, 4)
+    assert streak(origin, bits, today=ORIGIN + timedelta(days=4)) == 3
+    assert streak(origin, bits, today=ORIGIN + timedelta(days=5)) == 0
+    assert streak(origin, bits, today=ORIGIN + timedelta(days=2)) == 1
+
+
+def test_streak_spanning_bytes_and_from_origin():
+    origin, bits = _bitmap(*range(20))
+    assert streak(origin, bits, today=ORIGIN + timedelta(days=19)) == 20
+    assert streak(origin, bits, today=ORIGIN + timedelta(days=10)) == 11
+
+
+def test_streak_empty_or_before_origin():
+    assert streak(None, b"", today=ORIGIN) == 0
+    origin, bits = _bitmap(0)
+    assert streak(origin, bits, today=ORIGIN - timedelta(days=1)) == 0
+
+
+def test_rate_over_window():
+    origin, bits = _bitmap(*range(0, 40, 2))
+    # Last 10 days (30..39) hold 30, 32, 34, 36, 38
+    assert rate(origin, bits, days=10, today=ORIGIN + timedelta(days=39)) == 50.0
+    # Days after the last taken one count as not taken
+    assert rate(origin, bits, days=4, today=ORIGIN + timedelta(days=41)) == 25.0
+
+
+def test_rate_window_clipped_at_origin():
+    origin, bits = _bitmap(0, 1, 2)
+    assert rate(origin, bits, days=30, today=ORIGIN + timedelta(days=3)) == 75.0
+    assert rate(origin, bits, days=30, today=ORIGIN - timedelta(days=1)) == 0.0
+    assert rate(None, b"", today=ORIGIN) == 0.0
+
+
+def _evaluate(expr, doc: dict):
+    """The handful of aggregation operators take_pipeline's streak expression uses."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if not isinstance(expr, dict):
+        return expr
+    (op, arg), = expr.items()
+    if op == "$switch":
+        for branch in arg["branches"]:
+            if _evaluate(branch["case"], doc):
+                return _evaluate(branch["then"], doc)
+        return arg["default"]
+    if op == "$type":
+        return "missing" if arg[1:] not in doc else type(doc[arg[1:]]).__name__
+    if op == "$eq":
+        return _evaluate(arg[0], doc) == _evaluate(arg[1], doc)
+    if op == "$ifNull":
+        value = _evaluate(arg[0], doc)
+        return _evaluate(arg[1], doc) if value is None else value
+    if op == "$add":
+        return sum(_evaluate(a, doc) for a in arg)
+    raise NotImplementedError(op)
+
+
+def _take(doc: dict, today: date) -> int:
+    origin, bits = read(doc)
+    origin, bits = set_day(origin or today, bits, today)
+    return _evaluate(take_pipeline(today, origin, bits, datetime(2024, 1, 1))[0]["$set"]["streak"], doc)
+
+
+def test_take_on_legacy_document_keeps_bitmap_streak():
+    today = ORIGIN + timedelta(days=10)
+    # Not migrated: taken_dates only, the last four days up to yesterday
+    doc = {"start_date": ORIGIN.isoformat(),
+           "taken_dates": [(today - timedelta(days=d)).isoformat() for d in range(1, 5)]}
+    assert current_streak(doc, today - timedelta(days=1)) == 4
+    assert _take(doc, today) == 5
+
+    # Bitmap already converted but streak fields not filled in yet
+    origin, bits = _bitmap(7, 8, 9)
+    assert _take({"adherence_origin": origin.isoformat(), "adherence_bits": bits}, today) == 4
+
+
+def test_take_on_migrated_document():
+    today = ORIGIN + timedelta(days=10)
+    origin, bits = _bitmap(9)
+    doc = {"adherence_origin": origin.isoformat(), "adherence_bits": bits, "streak": 6,
+           "last_taken_day": (today - timedelta(days=1)).isoformat()}
+    assert _take(doc, today) == 7
+    assert _take({**doc, "last_taken_day": today.isoformat()}, today) == 6
+    assert _take({**doc, "last_taken_day": (today - timedelta(days=3)).isoformat()}, today) == 1
+    # Migrated, never taken
+    assert _take({**doc, "last_taken_day": None, "streak": 0}, today) == 1
@@ -0,0 +1,43 @@
+"""Risk history keyset cursor encoding."""
+
+import base64
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("bson")
+pytest.importorskip("fastapi")
+
+from bson import ObjectId  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+from routes.dashboard import decode_cursor, encode_cursor  # noqa: E402
+
+
+@pytest.mark.parametrize("created_at", [
+    datetime(2024, 3, 5, 14, 30, 0, 123456),
+    datetime(2024, 3, 5, 14, 30),
+])
+def test_round_trip(created_at):
+    oid = ObjectId()
+    cursor = encode_cursor(created_at, oid)
+    assert decode_cursor(cursor) == (created_at, oid)
+    # Safe to put in a query string as-is
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+def test_cursors_of_different_positions_differ():
+    created_at = datetime(2024, 3, 5, 14, 30)
+    assert encode_cursor(created_at, ObjectId()) != encode_cursor(created_at, ObjectId())
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"2024-03-05T14:30:00").decode(),
+    base64.urlsafe_b64encode(b"yesterday|65e6f0000000000000000000").decode(),
+    base64.urlsafe_b64encode(b"2024-03-05T14:30:00|not-an-oid").decode(),
+])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
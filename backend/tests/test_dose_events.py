@@ -0,0 +1,104 @@
+"""Dose times from medication schedules, including malformed legacy entries."""
+
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("motor")
+pytest.importorskip("pytest_asyncio")
+
+from bson import ObjectId  # noqa: E402
+
+import services.dose_events as dose_events  # noqa: E402
+from services.dose_events import nearest_dose, parse_time, record_missed_doses  # noqa: E402
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("08:00", (8, 0)),
+    (" 8:05 ", (8, 5)),
+    ("23:59:00", (23, 59)),
+    ("8:xx", None),
+    ("morning:", None),
+    ("24:00", None),
+    ("12:60", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_time(value, expected):
+    assert parse_time(value) == expected
+
+
+def test_nearest_dose_ignores_malformed_times():
+    now = datetime(2024, 3, 5, 9, 0)
+    assert nearest_dose(["8:xx", "morning:", "20:00", " 10:00"], now) == "10:00"
+    assert nearest_dose(["8:xx", "morning:"], now) is None
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Db(dict):
+    medications = None
+
+
+class _Collection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.inserted = []
+        self.ops = []
+
+    def find(self, query, projection=None):
+        return _Cursor([doc for doc in self.docs if doc.get("user_id") in query["user_id"].get("$in", [])]
+                       if "day" in query else self.docs)
+
+    async def bulk_write(self, ops, ordered=True):
+        self.ops.extend(ops)
+        return SimpleNamespace(matched_count=0, upserted_ids={i: ObjectId() for i in range(len(ops))})
+
+    async def insert_many(self, docs, ordered=True):
+        self.inserted.extend(docs)
+
+
+@pytest.mark.asyncio
+async def test_missed_doses_skip_malformed_times(monkeypatch):
+    day = date(2024, 3, 5)
+    created = datetime(2024, 1, 1)
+    medications = _Collection([
+        {"_id": ObjectId(), "user_id": "u1", "time_schedule": ["8:xx", "20:00"], "frequency": "daily",
+         "created_at": created},
+        {"_id": ObjectId(), "user_id": "u2", "time_schedule": ["morning:"], "frequency": "daily",
+         "created_at": created},
+        # Created after the dose time: the morning dose can't have been missed
+        {"_id": ObjectId(), "user_id": "u3", "time_schedule": ["07:00", "21:00"], "frequency": "daily",
+         "created_at": dose_events._scheduled_utc(day, "12:00")},
+    ])
+    db = _Db({dose_events.DAILY_COLLECTION: _Collection(), dose_events.COLLECTION: _Collection()})
+    db.medications = medications
+
+    invalidated = []
+
+    async def invalidate(user_id, *scopes):
+        invalidated.append((user_id, scopes))
+
+    monkeypatch.setattr(dose_events, "get_db", lambda: db)
+    monkeypatch.setattr(dose_events, "invalidate", invalidate)
+
+    assert await record_missed_doses(day) == 2
+    events = db[dose_events.COLLECTION].inserted
+    assert sorted((e["meta"]["user_id"], e["scheduled_time"]) for e in events) == [
+        ("u1", dose_events._scheduled_utc(day, "20:00")),
+        ("u3", dose_events._scheduled_utc(day, "21:00")),
+    ]
+    assert sorted(invalidated) == [("u1", ("medications",)), ("u3", ("medications",))]
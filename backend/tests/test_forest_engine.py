@@ -0,0 +1,62 @@
+"""FlatForest must reproduce sklearn's RandomForestClassifier exactly."""
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+from services.forest_engine import FlatForest
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    X, y = make_classification(n_samples=400, n_features=8, n_informative=5, random_state=0)
+    model = RandomForestClassifier(n_estimators=25, max_depth=7, random_state=0).fit(X, y)
+    return model, X
+
+
+def test_predict_proba_matches_sklearn(fitted):
+    model, X = fitted
+    forest = FlatForest.from_sklearn(model)
+    np.testing.assert_array_equal(forest.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+
+def test_single_row_and_threshold_ties(fitted):
+    model, X = fitted
+    forest = FlatForest.from_sklearn(model)
+    # Rows sitting exactly on split thresholds exercise the float32 <= comparison
+    ties = X[:50].copy()
+    internal = forest.left != np.arange(len(forest.left))
+    for i, (feature, threshold) in enumerate(zip(forest.feature[internal][:50], forest.threshold[internal][:50])):
+        ties[i, feature] = threshold
+    np.testing.assert_array_equal(forest.predict_proba(ties), model.predict_proba(ties))
+    np.testing.assert_array_equal(forest.predict_proba(X[0]), model.predict_proba(X[:1]))
+
+
+def test_contributions_sum_to_probability(fitted):
+    model, X = fitted
+    forest = FlatForest.from_sklearn(model)
+    bias, contrib = forest.contributions(X[:20])
+    np.testing.assert_allclose(bias + contrib.sum(axis=1), model.predict_proba(X[:20])[:, 1], atol=1e-12)
+
+
+def test_save_load_round_trip(fitted, tmp_path):
+    model, X = fitted
+    forest = FlatForest.from_sklearn(model)
+    manifest = forest.save(str(tmp_path), [f"f{i}" for i in range(X.shape[1])])
+    assert manifest["checksum"] == forest.checksum()
+
+    loaded, loaded_manifest = FlatForest.load(str(tmp_path), mmap=True, verify=True)
+    assert loaded.checksum() == manifest["checksum"]
+    assert loaded_manifest["n_estimators"] == model.n_estimators
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
+
+
+def test_load_rejects_tampered_array(fitted, tmp_path):
+    model, X = fitted
+    FlatForest.from_sklearn(model).save(str(tmp_path), [f"f{i}" for i in range(X.shape[1])])
+    threshold = np.load(tmp_path / "threshold.npy")
+    np.save(tmp_path / "threshold.npy", threshold + 1.0)
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        FlatForest.load(str(tmp_path), verify=True)
@@ -0,0 +1,95 @@
+"""Risk recommendations are validated before they reach the recommendation cache."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("motor")
+pytest.importorskip("pytest_asyncio")
+
+import services.openai_service as openai_service  # noqa: E402
+
+VALID = {
+    "summary": "Moderate risk driven mainly by blood pressure.",
+    "risk_factors": [{"factor": "High BP", "explanation": "Strains the heart"}],
+    "lifestyle_changes": [{"action": "Walk daily", "impact": "Lowers BP", "priority": "high"}],
+}
+MALFORMED = [
+    '{"summary": "Truncated reply", "risk_factors": [{"factor": "High',
+    json.dumps({"risk_factors": []}),  # missing summary
+    json.dumps({"summary": "x", "lifestyle_changes": [{"action": "Walk"}]}),
+]
+ARGS = {"inputs": {}, "risk_category": "Medium", "risk_percentage": 42.0}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    stored = {}
+
+    async def get_cached(key):
+        return stored.get(key)
+
+    async def store(key, template_version, recommendations):
+        stored[key] = recommendations
+
+    monkeypatch.setattr(openai_service.recommendation_cache, "get_cached", get_cached)
+    monkeypatch.setattr(openai_service.recommendation_cache, "store", store)
+    monkeypatch.setattr(openai_service, "_build_profile_text", lambda inputs: "profile")
+    return stored
+
+
+def _reply(monkeypatch, content: str):
+    async def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    monkeypatch.setattr(openai_service.client.chat.completions, "create", create)
+
+
+def _stream(monkeypatch, content: str):
+    async def stream_content(*args, **kwargs):
+        for i in range(0, len(content), 8):
+            yield content[i:i + 8]
+
+    monkeypatch.setattr(openai_service, "_stream_content", stream_content)
+
+
+@pytest.mark.asyncio
+async def test_valid_reply_is_cached_normalised(monkeypatch, cache):
+    _reply(monkeypatch, "```json\n" + json.dumps(VALID) + "\n```")
+    result = await openai_service.generate_risk_recommendations(**ARGS)
+    assert result["summary"] == VALID["summary"]
+    # Stored as the validated model dump, defaults included
+    assert result["positive_factors"] == [] and result["medical_recommendations"] == []
+    assert list(cache.values()) == [result]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content", MALFORMED)
+async def test_malformed_reply_is_not_cached(monkeypatch, cache, content):
+    _reply(monkeypatch, content)
+    with pytest.raises(Exception):
+        await openai_service.generate_risk_recommendations(**ARGS)
+    assert cache == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content", MALFORMED)
+async def test_malformed_stream_is_not_cached(monkeypatch, cache, content):
+    _stream(monkeypatch, content)
+    deltas = []
+    with pytest.raises(Exception):
+        async for delta in openai_service.stream_risk_recommendations(**ARGS):
+            deltas.append(delta)
+    assert "".join(deltas) == content
+    assert cache == {}
+
+
+@pytest.mark.asyncio
+async def test_valid_stream_is_cached(monkeypatch, cache):
+    _stream(monkeypatch, json.dumps(VALID))
+    text = "".join([delta async for delta in openai_service.stream_risk_recommendations(**ARGS)])
+    assert json.loads(text) == VALID
+    [stored] = cache.values()
+    assert stored["summary"] == VALID["summary"]
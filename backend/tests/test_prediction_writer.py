@@ -0,0 +1,197 @@
+"""WriteBehindBuffer flush, requeue and duplicate-key handling against an in-memory collection."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("bson")
+pytest.importorskip("motor")
+pytest.importorskip("fastapi")
+pytest_asyncio = pytest.importorskip("pytest_asyncio")
+
+from bson import ObjectId  # noqa: E402
+from pymongo.errors import AutoReconnect, BulkWriteError  # noqa: E402
+
+import services.prediction_writer as prediction_writer_module  # noqa: E402
+from services.prediction_writer import DUPLICATE_KEY, WriteBehindBuffer  # noqa: E402
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for the buffer; failures are scripted per call."""
+
+    def __init__(self):
+        self.docs: dict[ObjectId, dict] = {}
+        # Next insert_many stores the batch and then raises (ack lost)
+        self.lose_next_ack = False
+        self.fail_next_replace = False
+
+    async def insert_one(self, doc):
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for i, doc in enumerate(docs):
+            if doc["_id"] in self.docs:
+                errors.append({"index": i, "code": DUPLICATE_KEY, "errmsg": "E11000 duplicate key"})
+            else:
+                self.docs[doc["_id"]] = dict(doc)
+        if self.lose_next_ack:
+            self.lose_next_ack = False
+            raise AutoReconnect("connection closed")
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail_next_replace:
+            self.fail_next_replace = False
+            raise AutoReconnect("connection closed")
+        for request in requests:
+            self.docs[request._filter["_id"]] = dict(request._doc)
+
+    async def update_one(self, query, update):
+        self.docs[query["_id"]].update(update["$set"])
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(prediction_writer_module, "get_db", lambda: {"predictions": collection})
+    return collection
+
+
+@pytest_asyncio.fixture
+async def buffer(collection):
+    written = []
+
+    async def record(docs):
+        written.extend(docs)
+
+    # Long interval and large batches: the tests flush by hand
+    buffer = WriteBehindBuffer("predictions", max_batch_size=1000, flush_interval_ms=60_000,
+                               after_write=[record])
+    buffer.written = written
+    await buffer.start()
+    yield buffer
+    await buffer.stop()
+
+
+async def _add(buffer, count):
+    return [await buffer.add({"user_id": "u1", "n": i}) for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_batch_and_runs_hooks(buffer, collection):
+    ids = await _add(buffer, 3)
+    assert buffer.get(ids[0])["n"] == 0
+    await buffer.flush()
+
+    assert set(collection.docs) == set(ids)
+    assert [doc["_id"] for doc in buffer.written] == ids
+    assert buffer.get(ids[0]) is None
+    stats = buffer.stats()
+    assert (stats["flushes"], stats["written"], stats["failed"], stats["pending"]) == (1, 3, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeues_and_keeps_updates(buffer, collection):
+    ids = await _add(buffer, 2)
+    collection.docs.clear()
+
+    async def unreachable(docs, ordered=True):
+        raise AutoReconnect("no primary")
+
+    collection.insert_many, insert_many = unreachable, collection.insert_many
+    await buffer.flush()
+    assert buffer.stats()["pending"] == 2
+    assert buffer.stats()["retried"] == 2
+    assert buffer.written == []
+
+    await buffer.update(ids[0], {"recommendations_status": "ready"})
+    collection.insert_many = insert_many
+    await buffer.flush()
+    assert collection.docs[ids[0]]["recommendations_status"] == "ready"
+    assert buffer.stats()["written"] == 2
+    assert len(buffer.written) == 2
+
+
+@pytest.mark.asyncio
+async def test_requeued_documents_stored_by_failed_flush_count_as_written(buffer, collection):
+    ids = await _add(buffer, 3)
+    collection.lose_next_ack = True
+    await buffer.flush()
+    # Stored, but the buffer can't know: everything is requeued
+    assert set(collection.docs) == set(ids)
+    assert buffer.stats()["pending"] == 3
+
+    await buffer.update(ids[1], {"recommendations_status": "ready"})
+    await buffer.flush()
+
+    stats = buffer.stats()
+    assert (stats["written"], stats["failed"], stats["pending"]) == (3, 0, 0)
+    # The buffered copy (with the update made while requeued) replaced the stored one
+    assert collection.docs[ids[1]]["recommendations_status"] == "ready"
+    assert sorted(doc["n"] for doc in buffer.written) == [0, 1, 2]
+    assert buffer._requeued == set()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_of_new_document_is_a_failure(buffer, collection):
+    ids = await _add(buffer, 2)
+    collection.docs[ids[0]] = {"_id": ids[0], "user_id": "someone else"}
+    await buffer.flush()
+
+    stats = buffer.stats()
+    assert (stats["written"], stats["failed"], stats["pending"]) == (1, 1, 0)
+    assert collection.docs[ids[0]]["user_id"] == "someone else"
+    assert [doc["_id"] for doc in buffer.written] == [ids[1]]
+
+
+@pytest.mark.asyncio
+async def test_failed_overwrite_of_requeued_documents_is_retried(buffer, collection):
+    ids = await _add(buffer, 2)
+    collection.lose_next_ack = True
+    await buffer.flush()
+
+    collection.fail_next_replace = True
+    await buffer.flush()
+    assert buffer.stats()["pending"] == 2
+    assert buffer.written == []
+
+    await buffer.flush()
+    stats = buffer.stats()
+    assert (stats["written"], stats["failed"], stats["pending"]) == (2, 0, 0)
+    assert sorted(doc["_id"] for doc in buffer.written) == sorted(ids)
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_fails_fast_while_mongo_is_down(collection):
+    async def unreachable(docs, ordered=True):
+        raise AutoReconnect("no primary")
+
+    collection.insert_many = unreachable
+    buffer = WriteBehindBuffer("predictions", max_batch_size=1000, flush_interval_ms=10,
+                               max_pending=2, max_wait_ms=50)
+    await buffer.start()
+    try:
+        await _add(buffer, 2)
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(buffer.add({"user_id": "u1"}), 1)
+        stats = buffer.stats()
+        assert (stats["pending"], stats["rejected"]) == (2, 1)
+    finally:
+        await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_admits_once_a_flush_drains_it(collection):
+    buffer = WriteBehindBuffer("predictions", max_batch_size=1000, flush_interval_ms=10,
+                               max_pending=2, max_wait_ms=1000)
+    await buffer.start()
+    try:
+        await _add(buffer, 2)
+        oid = await asyncio.wait_for(buffer.add({"user_id": "u1"}), 1)
+        assert buffer.stats()["backpressure_waits"] >= 1
+        assert buffer.stats()["rejected"] == 0
+    finally:
+        await buffer.stop()
+    assert oid in collection.docs
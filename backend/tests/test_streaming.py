@@ -0,0 +1,58 @@
+"""JsonStreamParser: events must not depend on how the text is chunked."""
+
+import json
+
+import pytest
+
+from services.streaming import JsonStreamParser, parse_json_content, sse_event
+
+PLAN = {
+    "plan_name": "Heart \"Healthy\" Week",
+    "weekly_plan": [
+        {"day": "Monday", "exercises": [{"name": "Walk {brisk}", "sets": 1}]},
+        {"day": "Tuesday", "exercises": []},
+    ],
+    "tips": ["Hydrate, often", "Rest [at least] 7h"],
+    "duration_weeks": 4,
+    "notes": "Line\nbreak \\ backslash",
+}
+EXPECTED = [
+    ("field", "plan_name", PLAN["plan_name"]),
+    ("item", "weekly_plan", PLAN["weekly_plan"][0]),
+    ("item", "weekly_plan", PLAN["weekly_plan"][1]),
+    ("item", "tips", "Hydrate, often"),
+    ("item", "tips", "Rest [at least] 7h"),
+    ("field", "notes", PLAN["notes"]),
+]
+
+
+def _feed_in_chunks(text: str, size: int) -> tuple[JsonStreamParser, list]:
+    parser = JsonStreamParser()
+    events = []
+    for i in range(0, len(text), size):
+        events += parser.feed(text[i:i + size])
+    return parser, events
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_events_independent_of_chunking(size):
+    parser, events = _feed_in_chunks(json.dumps(PLAN, indent=2), size)
+    assert events == EXPECTED
+    assert parser.result() == PLAN
+
+
+def test_nested_object_values_are_not_fields():
+    parser, events = _feed_in_chunks('{"meta": {"name": "inner"}, "name": "outer"}', 1)
+    assert events == [("field", "name", "outer")]
+
+
+def test_result_strips_code_fences():
+    text = "```json\n" + json.dumps(PLAN) + "\n```"
+    parser, events = _feed_in_chunks(text, 5)
+    assert events == EXPECTED
+    assert parser.result() == PLAN
+    assert parse_json_content(text) == PLAN
+
+
+def test_sse_event_format():
+    assert sse_event("item", {"a": 1}) == 'event: item\ndata: {"a": 1}\n\n'
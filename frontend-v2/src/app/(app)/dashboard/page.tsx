@@ -13,7 +13,7 @@ import {
 import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import { Progress } from "@/components/ui/progress";
-import { getDashboardStats, getRiskHistory, getProgressTrend } from "@/lib/api";
+import { getDashboardOverview } from "@/lib/api";
 import {
   LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer,
   AreaChart, Area,
@@ -100,10 +100,8 @@ export default function DashboardPage() {
     if (!isSignedIn) return;
     async function fetchData() {
       try {
-        const [statsRes, historyRes, trendRes] = await Promise.all([
-          getDashboardStats(), getRiskHistory(10), getProgressTrend(),
-        ]);
-        setStats(statsRes.data); setHistory(historyRes.data); setTrend(trendRes.data);
+        const { data } = await getDashboardOverview(10);
+        setStats(data.stats); setHistory(data.history); setTrend(data.trend);
       } catch (err) { console.error("Dashboard fetch failed:", err); }
       finally { setLoading(false); }
     }
@@ -155,7 +153,9 @@ export default function DashboardPage() {
     {
       title: "Med Adherence",
       value: `${medAdherence?.rate ?? 0}%`,
-      subtitle: "Medication adherence",
+      subtitle: medAdherence?.doses
+        ? `Doses taken, last ${medAdherence.window_days} days`
+        : "Medication adherence",
       icon: Pill,
       gradient: "from-violet-500 to-purple-500",
       bg: "bg-violet-50",
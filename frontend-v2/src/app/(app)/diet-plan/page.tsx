@@ -18,7 +18,7 @@ import {
   Select, SelectContent, SelectItem, SelectTrigger, SelectValue,
 } from "@/components/ui/select";
 import Link from "next/link";
-import { generateDiet, getSavedDiets } from "@/lib/api";
+import { streamDiet, applyPlanEvent, getSavedDiets } from "@/lib/api";
 
 export default function DietPlanPage() {
   const [tab, setTab] = useState<"generate" | "saved">("generate");
@@ -44,9 +44,13 @@ export default function DietPlanPage() {
     setLoading(true); setError("");
     try {
       const payload = { age: parseInt(form.age), weight_kg: parseFloat(form.weight_kg), height_cm: parseFloat(form.height_cm), heart_risk: form.heart_risk, dietary_restrictions: form.dietary_restrictions ? form.dietary_restrictions.split(",").map((s) => s.trim()) : [], goal: form.goal };
-      const res = await generateDiet(payload);
-      setPlan(res.data);
-    } catch (err: any) { setError(err?.response?.data?.detail || "Failed to generate diet plan."); } finally { setLoading(false); }
+      // Days/meals render as soon as each one is complete
+      setPlan({});
+      await streamDiet(payload, (event, data) => {
+        if (event === "error") throw new Error(data.detail);
+        setPlan((prev: any) => applyPlanEvent(prev, event, data));
+      });
+    } catch (err: any) { setPlan(null); setError(err?.message || "Failed to generate diet plan."); } finally { setLoading(false); }
   };
 
   const mealColors = [
@@ -17,7 +17,7 @@ import { Badge } from "@/components/ui/badge";
 import {
   Select, SelectContent, SelectItem, SelectTrigger, SelectValue,
 } from "@/components/ui/select";
-import { predictRisk } from "@/lib/api";
+import { predictRisk, getPrediction } from "@/lib/api";
 
 type FormData = {
   high_bp: string; high_cholesterol: string; cholesterol_check: string;
@@ -52,6 +52,22 @@ export default function RiskAssessmentPage() {
   const updateField = (field: string, value: string) =>
     setForm((prev) => ({ ...prev, [field]: value }));
 
+  // Recommendations are generated in the background; poll until they land
+  const pollRecommendations = async (id: string) => {
+    for (let attempt = 0; attempt < 40; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, 1500));
+      try {
+        const res = await getPrediction(id);
+        if (res.data.recommendations_status !== "pending") {
+          setResult((prev: any) => prev && prev.id === id
+            ? { ...prev, recommendations: res.data.recommendations, recommendations_status: res.data.recommendations_status }
+            : prev);
+          return;
+        }
+      } catch { return; }
+    }
+  };
+
   const handleSubmit = async () => {
     setLoading(true); setError("");
     try {
@@ -59,6 +75,7 @@ export default function RiskAssessmentPage() {
       for (const [key, val] of Object.entries(form)) payload[key] = parseFloat(val);
       const res = await predictRisk(payload);
       setResult(res.data);
+      if (res.data.recommendations_status === "pending") pollRecommendations(res.data.id);
     } catch (err: any) {
       setError(err?.response?.data?.detail || "Prediction failed. Please try again.");
     } finally { setLoading(false); }
@@ -127,6 +144,12 @@ export default function RiskAssessmentPage() {
           </CardContent>
         </Card>
 
+        {!rec && result.recommendations_status === "pending" && (
+          <div className="flex items-center justify-center gap-2 text-sm text-muted-foreground py-4">
+            <Loader2 className="h-4 w-4 animate-spin" /> Generating your personalized recommendations...
+          </div>
+        )}
+
         {rec && (
           <>
             {rec.risk_factors?.length > 0 && (
@@ -19,7 +19,7 @@ import {
   Select, SelectContent, SelectItem, SelectTrigger, SelectValue,
 } from "@/components/ui/select";
 import Link from "next/link";
-import { generateWorkout, getSavedWorkouts } from "@/lib/api";
+import { streamWorkout, applyPlanEvent, getSavedWorkouts } from "@/lib/api";
 
 export default function WorkoutPlanPage() {
   const [tab, setTab] = useState<"generate" | "saved">("generate");
@@ -46,9 +46,13 @@ export default function WorkoutPlanPage() {
     setLoading(true); setError("");
     try {
       const payload = { age: parseInt(form.age), heart_risk: form.heart_risk, equipment: form.equipment ? form.equipment.split(",").map((s) => s.trim()) : [], injuries: form.injuries, fitness_goal: form.fitness_goal, fitness_level: form.fitness_level };
-      const res = await generateWorkout(payload);
-      setPlan(res.data); setExpandedDay(0);
-    } catch (err: any) { setError(err?.response?.data?.detail || "Failed to generate workout plan."); } finally { setLoading(false); }
+      // Days/meals render as soon as each one is complete
+      setPlan({}); setExpandedDay(0);
+      await streamWorkout(payload, (event, data) => {
+        if (event === "error") throw new Error(data.detail);
+        setPlan((prev: any) => applyPlanEvent(prev, event, data));
+      });
+    } catch (err: any) { setPlan(null); setError(err?.message || "Failed to generate workout plan."); } finally { setLoading(false); }
   };
 
   const dayColors = [
@@ -64,6 +64,55 @@ api.interceptors.response.use(
   }
 );
 
+/**
+ * POST a JSON body and consume the Server-Sent Events response, calling
+ * onEvent for each event. axios can't read a streamed body, so this uses fetch.
+ */
+export async function postEventStream(
+  path: string,
+  data: Record<string, unknown>,
+  onEvent: (event: string, data: any) => void
+) {
+  const headers: Record<string, string> = { "Content-Type": "application/json" };
+  const token = _tokenProvider ? await _tokenProvider().catch(() => null) : null;
+  if (token) headers["Authorization"] = `Bearer ${token}`;
+
+  const res = await fetch(`${API_URL}${path}`, { method: "POST", headers, body: JSON.stringify(data) });
+  if (!res.ok || !res.body) {
+    const body = await res.json().catch(() => ({}));
+    throw new Error(body.detail || `Request failed (${res.status})`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      let payload = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) payload += line.slice(6);
+      }
+      if (payload) onEvent(event, JSON.parse(payload));
+    }
+  }
+}
+
+/** Merge one streamed field/item/done event into a partially built object. */
+export const applyPlanEvent = (prev: any, event: string, data: any) => {
+  if (event === "done") return data;
+  if (event === "field") return { ...prev, [data.key]: data.value };
+  if (event === "item") return { ...prev, [data.key]: [...(prev?.[data.key] || []), data.value] };
+  return prev;
+};
+
 // ---------- Auth ----------
 export const syncUser = (data: {
   clerk_id: string;
@@ -81,6 +130,11 @@ export const updateProfile = (data: Record<string, unknown>) =>
 export const predictRisk = (data: Record<string, number>) =>
   api.post("/predict/risk", data);
 
+export const streamPredictRisk = (
+  data: Record<string, number>,
+  onEvent: (event: string, data: any) => void
+) => postEventStream("/predict/risk/stream", data, onEvent);
+
 export const getPrediction = (id: string) =>
   api.get(`/predict/risk/${id}`);
 
@@ -88,6 +142,11 @@ export const getPrediction = (id: string) =>
 export const generateWorkout = (data: Record<string, unknown>) =>
   api.post("/generate/workout", data);
 
+export const streamWorkout = (
+  data: Record<string, unknown>,
+  onEvent: (event: string, data: any) => void
+) => postEventStream("/generate/workout/stream", data, onEvent);
+
 export const getSavedWorkouts = (limit = 20) =>
   api.get(`/generate/workouts?limit=${limit}`);
 
@@ -97,6 +156,11 @@ export const getSavedWorkout = (id: string) =>
 export const generateDiet = (data: Record<string, unknown>) =>
   api.post("/generate/diet", data);
 
+export const streamDiet = (
+  data: Record<string, unknown>,
+  onEvent: (event: string, data: any) => void
+) => postEventStream("/generate/diet/stream", data, onEvent);
+
 export const getSavedDiets = (limit = 20) =>
   api.get(`/generate/diets?limit=${limit}`);
 
@@ -109,11 +173,12 @@ export const addMedication = (data: Record<string, unknown>) =>
 
 export const getMedications = () => api.get("/medications");
 
-export const markMedicationTaken = (id: string) =>
-  api.put(`/medications/${id}/take`);
+// scheduledTime ("HH:MM") picks the dose; otherwise the one nearest to now is logged
+export const markMedicationTaken = (id: string, scheduledTime?: string) =>
+  api.put(`/medications/${id}/take`, null, { params: { scheduled_time: scheduledTime } });
 
-export const skipMedication = (id: string) =>
-  api.put(`/medications/${id}/skip`);
+export const skipMedication = (id: string, scheduledTime?: string) =>
+  api.put(`/medications/${id}/skip`, null, { params: { scheduled_time: scheduledTime } });
 
 export const resetMedication = (id: string) =>
   api.put(`/medications/${id}/reset`);
@@ -139,9 +204,16 @@ export const scanPrescription = (file: File) => {
 
 // ---------- Dashboard ----------
 export const getDashboardStats = () => api.get("/dashboard/stats");
-export const getRiskHistory = (limit = 20) =>
-  api.get(`/dashboard/risk-history?limit=${limit}`);
+// Pass the previous response's "x-next-cursor" header to fetch the next page
+export const getRiskHistory = (limit = 20, cursor?: string) =>
+  api.get("/dashboard/risk-history", { params: { limit, cursor } });
 export const getProgressTrend = () => api.get("/dashboard/progress-trend");
+// stats + first history page + trend in a single request
+export const getDashboardOverview = (historyLimit = 10) =>
+  api.get("/dashboard/overview", { params: { history_limit: historyLimit } });
+// dose-level adherence buckets (rate + on-time %), oldest first
+export const getAdherence = (period: "daily" | "weekly" | "monthly" = "daily", limit = 30) =>
+  api.get("/dashboard/adherence", { params: { period, limit } });
 
 // ---------- Community ----------
 export const createPost = (data: Record<string, unknown>) =>
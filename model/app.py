@@ -1,8 +1,11 @@
-from fastapi import FastAPI, HTTPException
+import io
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List
 import joblib
+import numpy as np
 import uvicorn
 
 app = FastAPI(title="CardioSphere Prediction API", version="1.0.0")
@@ -16,8 +19,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load the trained model once at startup
+# Load the trained model once at startup.
+# Under gunicorn --preload (see gunicorn.conf.py) this runs in the master
+# before workers fork, so all workers share the model pages copy-on-write.
 loaded_model = joblib.load('heart_disease_model.pkl')
+N_FEATURES = loaded_model.n_features_in_
+
+# Binary batch mode content types
+RAW_F32 = "application/octet-stream"  # little-endian float32, row-major (rows x N_FEATURES)
+NPY = "application/x-npy"              # .npy bytes of a 2-D array
+MAX_BATCH_ROWS = 1_000_000
 
 
 class PredictRequest(BaseModel):
@@ -39,5 +50,51 @@ def predict(payload: PredictRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _decode_rows(body: bytes, content_type: str) -> np.ndarray:
+    """Turn a binary request body into a (rows, N_FEATURES) matrix without JSON parsing."""
+    if content_type.startswith(NPY):
+        try:
+            rows = np.load(io.BytesIO(body), allow_pickle=False)
+        except (ValueError, EOFError, OSError) as e:
+            raise HTTPException(status_code=400, detail=f"Body is not a valid .npy array: {e}")
+        if not isinstance(rows, np.ndarray) or rows.dtype.kind not in "biuf":
+            raise HTTPException(status_code=400, detail="Expected a numeric .npy array")
+    else:
+        if len(body) % (4 * N_FEATURES):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Body must be little-endian float32 rows of {N_FEATURES} values",
+            )
+        rows = np.frombuffer(body, dtype="<f4").reshape(-1, N_FEATURES)
+    if rows.ndim != 2 or rows.shape[1] != N_FEATURES:
+        raise HTTPException(status_code=400, detail=f"Expected a 2-D array with {N_FEATURES} columns")
+    if not 0 < len(rows) <= MAX_BATCH_ROWS:
+        raise HTTPException(status_code=400, detail=f"Batch must have 1-{MAX_BATCH_ROWS} rows")
+    return rows
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    High-throughput scoring for offline rescoring.
+    Body: raw little-endian float32 rows (application/octet-stream) or .npy
+    bytes (application/x-npy). Returns class-1 probabilities in the same
+    format: raw float32 by default, .npy when the request Accepts application/x-npy.
+    """
+    body = await request.body()
+    rows = _decode_rows(body, request.headers.get("content-type", RAW_F32))
+    try:
+        probability = await run_in_threadpool(lambda: loaded_model.predict_proba(rows)[:, 1])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    probability = probability.astype("<f4")
+    if NPY in request.headers.get("accept", ""):
+        buffer = io.BytesIO()
+        np.save(buffer, probability, allow_pickle=False)
+        return Response(content=buffer.getvalue(), media_type=NPY)
+    return Response(content=probability.tobytes(), media_type=RAW_F32, headers={"X-Rows": str(len(probability))})
+
+
 if __name__ == '__main__':
     uvicorn.run("app:app", host="0.0.0.0", port=5000, reload=True)
@@ -0,0 +1,12 @@
+# Multi-worker serving for app.py, e.g. as an offline rescoring sidecar:
+#   uv run gunicorn app:app -c gunicorn.conf.py
+# preload_app imports app.py (and loads the model) once in the master;
+# workers are forked afterwards and share the model memory copy-on-write.
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
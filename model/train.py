@@ -1,14 +1,16 @@
-import pandas as pd
+import os
+import sys
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import roc_auc_score, accuracy_score, log_loss
 
-data = pd.read_csv('data.csv', skipinitialspace=True)
+# Typed columnar cache of data.csv shared with the backend training script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'ml'))
+from dataset import load_dataset
 
-X = data.drop(columns=['HeartDiseaseorAttack','Education','Income','NoDocbcCost','AnyHealthcare','MentHlth','PhysHlth'])
-y = data['HeartDiseaseorAttack']
-print(X)
-print(y)
+X, y, feature_names = load_dataset()
+print(feature_names)
+print(X.shape, y.shape)
 
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 